@@ -0,0 +1,70 @@
+"""Check rule specs against the hand-written engines and time them.
+
+Each bundled spec in ``simulation/specs`` is run from the same random grid
+as the built-in ruleset it reimplements, both interpreted rule by rule and
+compiled to a lookup table. The script exits with status 1 if any result
+differs from the hand-written engine. Example::
+
+    python benchmark_specs.py --size 1024x1024 --steps 20
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+from headless import parse_size, random_grid
+from simulation import get_ruleset
+from simulation.registry import Ruleset
+from simulation.spec import load_ruleset, read_spec, spec_step
+
+SPEC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'simulation', 'specs')
+
+# Bundled spec file -> built-in ruleset it must reproduce
+BUNDLED = {
+    'city.json': 'city',
+    'city2.json': 'city2',
+    'city3.toml': 'city3',
+}
+
+
+def time_steps(ruleset, grid, steps):
+    """Return the grid after ``steps`` generations of ``ruleset`` and the seconds per generation."""
+    state, params = grid, ruleset.params()
+    start = time.perf_counter()
+    for _ in range(steps):
+        state = ruleset.step(state, params)
+    return state, (time.perf_counter() - start) / steps
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--size', type=parse_size, default=(512, 512), help='ROWSxCOLS of the random grid')
+    parser.add_argument('--steps', type=int, default=20, help='generations to run')
+    parser.add_argument('--density', type=float, default=0.4, help='fraction of occupied cells')
+    parser.add_argument('--seed', type=int, default=0, help='seed for the random grid')
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(args.seed)
+    failed = False
+    for filename, builtin in BUNDLED.items():
+        path = os.path.join(SPEC_DIR, filename)
+        spec = read_spec(path)
+        compiled = load_ruleset(path)
+        interpreted = Ruleset(spec['name'], spec_step, spec['n_states'], {'spec': spec})
+        grid = random_grid(args.size, compiled.n_states, args.density, rng)
+
+        expected, hand_written = time_steps(get_ruleset(builtin), grid, args.steps)
+        results = {'interpreted': time_steps(interpreted, grid, args.steps),
+                   'compiled': time_steps(compiled, grid, args.steps)}
+        print(f'{filename} vs {builtin}: hand-written {hand_written * 1000:.2f} ms/gen')
+        for kind, (result, seconds) in results.items():
+            match = np.array_equal(result, expected)
+            failed |= not match
+            print(f'  {kind:12s}{seconds * 1000:8.2f} ms/gen  {"matches" if match else "DIFFERS"}')
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
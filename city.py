@@ -1,6 +1,11 @@
 import pygame
 import numpy as np
 
+from simulation.buffered import BufferedStepper
+from simulation.scheduler import StepScheduler
+from simulation.snapshot import restore_snapshot, save_snapshot
+from render import GridRenderer, color_table
+
 # Initialize Pygame
 pygame.init()
 
@@ -17,7 +22,7 @@ screen = pygame.display.set_mode((width, height))
 pygame.display.set_caption("Modified Game of Life")
 
 # Create a 2D array to store the state of each cell
-grid = np.zeros((rows, cols), dtype=int)
+grid = np.zeros((rows, cols), dtype=np.uint8)
 
 # Colors
 WHITE = (255, 255, 255)
@@ -44,19 +49,12 @@ module_colors = {
     'health': YELLOW
 }
 
+# Renderer that maps each module type to its color, with black gridlines
+renderer = GridRenderer(rows, cols, cell_size, color_table(module_types, module_colors, WHITE), BLACK)
+
 # Function to draw the grid
 def draw_grid():
-    for y in range(rows):
-        for x in range(cols):
-            color = WHITE
-            if grid[y][x] != 0:  # If the cell is not dead, get its color
-                for module, value in module_types.items():
-                    if grid[y][x] == value:
-                        color = module_colors[module]
-                        break
-            rect = pygame.Rect(x*cell_size, y*cell_size, cell_size, cell_size)
-            pygame.draw.rect(screen, color, rect)
-            pygame.draw.rect(screen, BLACK, rect, 1)
+    return renderer.update(screen, grid)
 
 
 # Function to draw buttons
@@ -71,93 +69,82 @@ def toggle_cell(pos, module):
     x, y = pos[0] // cell_size, pos[1] // cell_size
     if 0 <= x < cols and 0 <= y < rows:  # Check if the position is within bounds
         grid[y][x] = module_types[module]  # Use module_types to get the integer value
+        scheduler.touch()  # Redraw on the next frame
+
+
 
+# Two preallocated buffers: each generation is written into the spare one and they swap
+stepper = BufferedStepper('city', grid, {'module_types': module_types})
+grid = stepper.grid
 
+# Snapshot file written by the 's' key and restored by the 'l' key
+snapshot_path = 'city.snap'
 
 def apply_modified_rules():
-    new_grid = np.zeros((rows, cols), dtype=int)
-    for y in range(rows):
-        for x in range(cols):
-            # Count the neighbors for each type
-            neighbors = {module: 0 for module in module_types}
-            for i in (-1, 0, 1):
-                for j in (-1, 0, 1):
-                    if i == 0 and j == 0:
-                        continue
-                    ny, nx = y + i, x + j
-                    if 0 <= ny < rows and 0 <= nx < cols:
-                        neighbor_type = grid[ny][nx]
-                        for module, value in module_types.items():
-                            if neighbor_type == value:
-                                neighbors[module] += 1
-
-            # Apply the rules based on the current cell's type and its neighbors
-            if grid[y][x] == module_types['green']:
-                # Green stays if it has 2 or 3 neighbors of any type
-                if 2 <= sum(neighbors.values()) <= 3:
-                    new_grid[y][x] = module_types['green']
-            elif grid[y][x] == module_types['living']:
-                # Living stays if it has 2 or 3 living neighbors, otherwise becomes green
-                if 2 <= neighbors['living'] <= 3:
-                    new_grid[y][x] = module_types['living']
-                else:
-                    new_grid[y][x] = module_types['green']
-            elif grid[y][x] == module_types['commerce']:
-                # Commerce becomes or stays alive if it has at least one living neighbor
-                if neighbors['living'] >= 1:
-                    new_grid[y][x] = module_types['commerce']
-            elif grid[y][x] == module_types['health']:
-                # Health becomes or stays alive if there are at least two living neighbors
-                if neighbors['living'] >= 2:
-                    new_grid[y][x] = module_types['health']
-            else:
-                # If the cell is dead, check for revival conditions
-                if neighbors['living'] == 3:
-                    new_grid[y][x] = module_types['living']
-                elif neighbors['commerce'] >= 1 and neighbors['living'] >= 1:
-                    new_grid[y][x] = module_types['commerce']
-                elif neighbors['health'] >= 1 and neighbors['living'] >= 2:
-                    new_grid[y][x] = module_types['health']
-
-    return new_grid
+    stepper.step()
+    return stepper.grid
 
 
 # Main loop
 running = True
-paused = True
+drawn_version = None  # scheduler.version of the state on screen
 drawing = False  # Variable to track if the mouse is being dragged
 clock = pygame.time.Clock()
 
+# Step on a background thread at its own rate, independent of the frame rate
+generations_per_second = 30
+scheduler = StepScheduler(apply_modified_rules, generations_per_second)
+
+# Clear the window once; after that only changed cells are repainted
+screen.fill(WHITE)
+draw_buttons()
+pygame.display.flip()
+
 while running:
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            running = False
-        elif event.type == pygame.MOUSEBUTTONDOWN:
-            if event.pos[1] > height - button_height:
-                # If the click is on the button area, change the current module
-                current_module = list(module_types.keys())[(event.pos[0] // (width // len(module_types)))]
-            else:
-                drawing = True  # Start drawing when the mouse button is pressed
-                toggle_cell(event.pos, current_module)
-        elif event.type == pygame.MOUSEBUTTONUP:
-            drawing = False  # Stop drawing when the mouse button is released
-        elif event.type == pygame.MOUSEMOTION:
-            if drawing:  # If we're currently drawing, toggle cells as the mouse moves
-                toggle_cell(event.pos, current_module)
-        elif event.type == pygame.KEYDOWN:
-            if event.key == pygame.K_SPACE:
-                paused = not paused
-            elif event.key == pygame.K_r:  # Reset the game when 'r' is pressed
-                grid = np.zeros((rows, cols), dtype=int)
-
-    screen.fill(WHITE)
-
-    if not paused:
-        grid = apply_modified_rules()
-
-    draw_grid()
-    draw_buttons()
-    pygame.display.flip()
+    # Poll input outside the lock so a generation in progress never delays it
+    events = pygame.event.get()
+
+    # Hold the stepping thread off while applying the input and drawing
+    with scheduler:
+        grid = stepper.grid  # The buffers trade places on every generation
+        for event in events:
+            if event.type == pygame.QUIT:
+                running = False
+            elif event.type == pygame.MOUSEBUTTONDOWN:
+                if event.pos[1] > height - button_height:
+                    # If the click is on the button area, change the current module
+                    current_module = list(module_types.keys())[(event.pos[0] // (width // len(module_types)))]
+                else:
+                    drawing = True  # Start drawing when the mouse button is pressed
+                    toggle_cell(event.pos, current_module)
+            elif event.type == pygame.MOUSEBUTTONUP:
+                drawing = False  # Stop drawing when the mouse button is released
+            elif event.type == pygame.MOUSEMOTION:
+                if drawing:  # If we're currently drawing, toggle cells as the mouse moves
+                    toggle_cell(event.pos, current_module)
+            elif event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_SPACE:
+                    scheduler.paused = not scheduler.paused
+                elif event.key == pygame.K_r:  # Reset the game when 'r' is pressed
+                    grid[...] = 0  # Clear in place; the stepper owns the buffers
+                    scheduler.touch()
+                elif event.key == pygame.K_s:  # Save a snapshot when 's' is pressed
+                    save_snapshot(snapshot_path, 'city', grid, stepper.generation)
+                elif event.key == pygame.K_l:  # Restore the saved snapshot when 'l' is pressed
+                    try:
+                        stepper.generation = restore_snapshot(snapshot_path, 'city', grid)
+                        scheduler.touch()
+                    except (OSError, ValueError) as error:
+                        print(f"Could not load {snapshot_path}: {error}")
+
+        # Repaint only after a new generation or an edit, and only the cells that changed
+        dirty_rects = []
+        if scheduler.version != drawn_version:
+            drawn_version = scheduler.version
+            dirty_rects = draw_grid()
+    if dirty_rects:
+        pygame.display.update(dirty_rects)
     clock.tick(30)  # Increase the clock tick if the drawing feels unresponsive
 
+scheduler.close()
 pygame.quit()
@@ -1,6 +1,10 @@
 import pygame
 import numpy as np
-import random
+
+from simulation.buffered import BufferedStepper
+from simulation.scheduler import StepScheduler
+from simulation.snapshot import restore_snapshot, save_snapshot
+from render import CellLabels, GridRenderer, color_table
 
 # Initialize Pygame
 pygame.init()
@@ -18,8 +22,8 @@ screen = pygame.display.set_mode((width, height))
 pygame.display.set_caption("Modified Game of Life")
 
 # Create a 2D array to store the state of each cell and their entropy
-grid = np.zeros((rows, cols), dtype=int)
-entropy_grid = np.zeros((rows, cols))
+grid = np.zeros((rows, cols), dtype=np.uint8)
+entropy_grid = np.zeros((rows, cols), dtype=np.float32)
 
 # Colors
 WHITE = (255, 255, 255)
@@ -62,24 +66,18 @@ module_colors = {
 
 current_module = 'green'
 
+# Renderer that maps each module type to its color, with black gridlines
+renderer = GridRenderer(rows, cols, cell_size, color_table(module_types, module_colors, WHITE), BLACK)
+# Entropy values drawn as text in each cell; the font is loaded once and rendered values are cached
+entropy_labels = CellLabels(renderer, pygame.font.SysFont(None, 24), BLACK)
+
 # Function to draw the grid and display entropy values
 def draw_grid(grid, entropy_grid):
-    for y in range(rows):
-        for x in range(cols):
-            color = WHITE
-            if grid[y][x] != 0:  # If the cell is not dead, get its color
-                module_key = next(key for key, value in module_types.items() if value == grid[y][x])
-                color = module_colors[module_key]
-            rect = pygame.Rect(x*cell_size, y*cell_size, cell_size, cell_size)
-            pygame.draw.rect(screen, color, rect)
-            pygame.draw.rect(screen, BLACK, rect, 1)
-
-            # Render the entropy value as text
-            entropy_value = entropy_grid[y][x]
-            font = pygame.font.SysFont(None, 24)  # Choose a font and size that fits your cell size
-            text = font.render(f"{entropy_value:.2f}", True, BLACK)  # Render the text with two decimal places
-            text_rect = text.get_rect(center=rect.center)  # Center the text in the cell
-            screen.blit(text, text_rect)
+    # Cells whose label changed are repainted along with cells whose type changed
+    relabeled = entropy_labels.update(entropy_grid)
+    dirty_rects = renderer.update(screen, grid, relabeled)
+    entropy_labels.blit(screen, dirty_rects)
+    return dirty_rects
 
 
 # Function to draw buttons
@@ -95,12 +93,7 @@ def toggle_cell(pos, module):
     if 0 <= x < cols and 0 <= y < rows:  # Check if the position is within bounds
         grid[y][x] = module_types[module]
         adjust_entropy(y, x, entropy_values[module])
-
-# Helper function to determine if a transition should occur based on entropy
-def should_transition(entropy, threshold, influence):
-    # The probability of transition increases as the entropy difference increases
-    probability = (entropy - threshold + influence) / 2
-    return random.random() < probability
+        scheduler.touch()  # Redraw on the next frame
 
 # Function to adjust entropy in the grid
 def adjust_entropy(y, x, entropy):
@@ -114,126 +107,87 @@ def adjust_entropy(y, x, entropy):
                 entropy_grid[ny][nx] = min(1, max(0, entropy_grid[ny][nx]))  # Ensure entropy stays between 0 and 1
 
 # Function to apply city rules based on entropy
-# Function to apply city rules based on entropy
-def apply_city_rules(grid, module_types, entropy_grid, entropy_values, default_entropy_value):
-    new_grid = np.zeros((rows, cols), dtype=int)
-    new_entropy_grid = np.copy(entropy_grid)  # Copy the current entropy grid to update it
-
-    for y in range(rows):
-        for x in range(cols):
-            # Calculate the influence of neighboring cells
-            entropy_influence = 0
-            for i in (-1, 0, 1):
-                for j in (-1, 0, 1):
-                    if i == 0 and j == 0:
-                        continue
-                    ny, nx = y + i, x + j
-                    if 0 <= ny < rows and 0 <= nx < cols:
-                        entropy_influence += entropy_grid[ny][nx]
-
-            # Normalize the entropy influence
-            entropy_influence /= 8  # There are 8 neighbors
-
-            current_type = grid[y][x]
-            current_entropy = entropy_grid[y][x]
-
-            # Apply rules based on the current module type and its entropy
-            for y in range(rows):
-                for x in range(cols):
-                    # ... (previous code to calculate entropy_influence)
-
-                    current_type = grid[y][x]
-                    current_entropy = entropy_grid[y][x]
-
-                    # Formal structures  may degrade to informal based on entropy and influence
-                    if current_type == module_types['formal']:
-                        if should_transition(current_entropy, entropy_values['formal'], entropy_influence):
-                            new_grid[y][x] = module_types['informal']
-
-                    # Informal structures may upgrade to formal based on entropy and influence
-                    elif current_type == module_types['informal']:
-                        if should_transition(current_entropy, entropy_values['informal'], -entropy_influence):
-                            new_grid[y][x] = module_types['formal']
-
-                    # Green spaces may become informal based on surrounding entropy
-                    elif current_type == module_types['green']:
-                        if should_transition(entropy_influence, entropy_values['green'], 0):
-                            new_grid[y][x] = module_types['informal']
-
-                    # Commercial areas may degrade based on surrounding entropy
-                    elif current_type == module_types['commerce']:
-                        if should_transition(entropy_influence, entropy_values['commerce'], 0):
-                            new_grid[y][x] = module_types['informal']
-
-                    # Healthcare facilities may degrade based on surrounding entropy
-                    elif current_type == module_types['health']:
-                        if should_transition(entropy_influence, entropy_values['health'], 0):
-                            new_grid[y][x] = module_types['informal']
-
-                    # If no transition occurs, maintain current type
-                    if new_grid[y][x] == 0:
-                        new_grid[y][x] = current_type
-
-            # Calculate the new entropy value based on the type of module placed
-            new_entropy_value = entropy_values.get(current_type, default_entropy_value)
-
-            # Adjust the entropy of the current cell
-            new_entropy_grid[y][x] = new_entropy_value
-
-            # Adjust the entropy of neighboring cells based on the new entropy value
-            for i in (-1, 0, 1):
-                for j in (-1, 0, 1):
-                    if i == 0 and j == 0:
-                        continue
-                    ny, nx = y + i, x + j
-                    if 0 <= ny < rows and 0 <= nx < cols:
-                        # Update the entropy of neighbors with some factor of the new entropy value
-                        entropy_factor = 0.1  # This factor can be adjusted
-                        new_entropy_grid[ny][nx] += entropy_factor * new_entropy_value
-                        # Ensure entropy stays between 0 and 1
-                        new_entropy_grid[ny][nx] = min(1, max(0, new_entropy_grid[ny][nx]))
-
-    return new_grid, new_entropy_grid
+# Two preallocated buffers per plane: each generation is written into the spare ones and they swap.
+# Each cell's random draw is keyed by (seed, generation, cell), so a run is reproducible from its seed
+seed = None  # Set to an integer to replay the same run
+stepper = BufferedStepper('city4', (grid, entropy_grid), {
+    'module_types': module_types,
+    'entropy_values': entropy_values,
+    'default_entropy_value': default_entropy_value,
+}, seed=seed)
+grid, entropy_grid = stepper.state
+
+# Snapshot file written by the 's' key and restored by the 'l' key
+snapshot_path = 'city4.snap'
+
+def apply_city_rules():
+    stepper.step()
+    return stepper.state
 
 
 
 # Main loop and event handling...
 running = True
-paused = True
+drawn_version = None  # scheduler.version of the state on screen
 drawing = False  # Variable to track if the mouse is being dragged
 clock = pygame.time.Clock()
 
+# Step on a background thread at its own rate, independent of the frame rate
+generations_per_second = 60
+scheduler = StepScheduler(apply_city_rules, generations_per_second)
+
+# Clear the window once; after that only changed cells are repainted
+screen.fill(WHITE)
+draw_buttons()
+pygame.display.flip()
+
 while running:
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            running = False
-        elif event.type == pygame.MOUSEBUTTONDOWN:
-            if event.pos[1] > height - button_height:
-                # If the click is on the button area, change the current module
-                current_module = list(module_types.keys())[(event.pos[0] // (width // len(module_types)))]
-            else:
-                drawing = True  # Start drawing when the mouse button is pressed
-                toggle_cell(event.pos, current_module)
-        elif event.type == pygame.MOUSEBUTTONUP:
-            drawing = False  # Stop drawing when the mouse button is released
-        elif event.type == pygame.MOUSEMOTION:
-            if drawing:  # If we're currently drawing, toggle cells as the mouse moves
-                toggle_cell(event.pos, current_module)
-        elif event.type == pygame.KEYDOWN:
-            if event.key == pygame.K_SPACE:
-                paused = not paused
-            elif event.key == pygame.K_r:  # Reset the game when 'r' is pressed
-                grid = np.zeros((rows, cols), dtype=int)
-                entropy_grid = np.full((rows, cols), default_entropy_value)
-
-    screen.fill(WHITE)
-
-    if not paused:
-     grid, entropy_grid = apply_city_rules(grid, module_types, entropy_grid, entropy_values, default_entropy_value)
-
-    draw_grid(grid, entropy_grid)
-    draw_buttons()
-    pygame.display.flip()
+    # Poll input outside the lock so a generation in progress never delays it
+    events = pygame.event.get()
+
+    # Hold the stepping thread off while applying the input and drawing
+    with scheduler:
+        grid, entropy_grid = stepper.state  # The buffers trade places on every generation
+        for event in events:
+            if event.type == pygame.QUIT:
+                running = False
+            elif event.type == pygame.MOUSEBUTTONDOWN:
+                if event.pos[1] > height - button_height:
+                    # If the click is on the button area, change the current module
+                    current_module = list(module_types.keys())[(event.pos[0] // (width // len(module_types)))]
+                else:
+                    drawing = True  # Start drawing when the mouse button is pressed
+                    toggle_cell(event.pos, current_module)
+            elif event.type == pygame.MOUSEBUTTONUP:
+                drawing = False  # Stop drawing when the mouse button is released
+            elif event.type == pygame.MOUSEMOTION:
+                if drawing:  # If we're currently drawing, toggle cells as the mouse moves
+                    toggle_cell(event.pos, current_module)
+            elif event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_SPACE:
+                    scheduler.paused = not scheduler.paused
+                elif event.key == pygame.K_r:  # Reset the game when 'r' is pressed
+                    # Clear in place; the stepper owns the buffers
+                    grid[...] = 0
+                    entropy_grid[...] = default_entropy_value
+                    scheduler.touch()
+                elif event.key == pygame.K_s:  # Save a snapshot when 's' is pressed
+                    save_snapshot(snapshot_path, 'city4', (grid, entropy_grid), stepper.generation, ('state', 'entropy'))
+                elif event.key == pygame.K_l:  # Restore the saved snapshot when 'l' is pressed
+                    try:
+                        stepper.generation = restore_snapshot(snapshot_path, 'city4', (grid, entropy_grid))
+                        scheduler.touch()
+                    except (OSError, ValueError) as error:
+                        print(f"Could not load {snapshot_path}: {error}")
+
+        # Repaint only after a new generation or an edit, and only the cells that changed
+        dirty_rects = []
+        if scheduler.version != drawn_version:
+            drawn_version = scheduler.version
+            dirty_rects = draw_grid(grid, entropy_grid)
+    if dirty_rects:
+        pygame.display.update(dirty_rects)
     clock.tick(60)  # Increase the clock tick if the drawing feels unresponsive
 
+scheduler.close()
 pygame.quit()
\ No newline at end of file
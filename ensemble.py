@@ -0,0 +1,67 @@
+"""Run an ensemble of city4 simulations and summarize them per generation.
+
+Every member starts from the same grid and entropy plane and draws its own
+random transitions (see ``simulation.ensemble``). The statistics CSV holds,
+per generation, the mean and variance across members of the fraction of
+cells in every state and of the mean entropy. Example::
+
+    python ensemble.py --members 1000 --size 64x64 --steps 200 --seed 1 --stats runs/ensemble.csv
+"""
+import argparse
+import csv
+import time
+
+import numpy as np
+
+from headless import initial_state, parse_size, random_grid
+from simulation import get_ruleset
+from simulation.ensemble import Ensemble
+
+
+def write_statistics(path, results):
+    """Write the result of ``Ensemble.run`` to the CSV file ``path``."""
+    n_states = results['fraction_mean'].shape[1]
+    with open(path, 'w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(['generation'] + [f'mean_state_{value}' for value in range(n_states)]
+                        + [f'var_state_{value}' for value in range(n_states)] + ['mean_entropy', 'var_entropy'])
+        for row in range(len(results['generation'])):
+            writer.writerow([int(results['generation'][row])] + results['fraction_mean'][row].tolist()
+                            + results['fraction_var'][row].tolist()
+                            + [float(results['entropy_mean'][row]), float(results['entropy_var'][row])])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--members', type=int, default=100, help='number of independent runs')
+    parser.add_argument('--steps', type=int, default=100, help='generations to run')
+    parser.add_argument('--input', help='initial grid as a .npy file')
+    parser.add_argument('--entropy', help='initial entropy grid as a .npy file')
+    parser.add_argument('--size', type=parse_size, default=(56, 80), help='ROWSxCOLS of a random initial grid')
+    parser.add_argument('--density', type=float, default=0.3, help='fraction of occupied cells in a random grid')
+    parser.add_argument('--seed', type=int, help='seed for the random grid and every member')
+    parser.add_argument('--stats', help='CSV file for the per-generation statistics')
+    args = parser.parse_args(argv)
+
+    ruleset = get_ruleset('city4')
+    rng = np.random.default_rng(args.seed)
+    grid = np.load(args.input) if args.input else random_grid(args.size, ruleset.n_states, args.density, rng)
+    entropy_grid = np.load(args.entropy) if args.entropy else None
+    ensemble = Ensemble(args.members, initial_state(ruleset, grid, entropy_grid), seed=args.seed)
+
+    start = time.perf_counter()
+    results = ensemble.run(args.steps)
+    elapsed = time.perf_counter() - start
+    if args.stats:
+        write_statistics(args.stats, results)
+
+    means = ', '.join(f'{module} {results["fraction_mean"][-1][value]:.3f}'
+                      for module, value in ruleset.defaults['module_types'].items())
+    print(f'city4 ensemble of {args.members}: {args.steps} generations of {grid.shape[0]}x{grid.shape[1]} '
+          f'in {elapsed:.3f}s')
+    print(f'generation {args.steps}: {means}; entropy {results["entropy_mean"][-1]:.3f} '
+          f'(var {results["entropy_var"][-1]:.2e})')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,11 @@
 import pygame
 import numpy as np
 
+from simulation.buffered import BufferedStepper
+from simulation.scheduler import StepScheduler
+from simulation.snapshot import restore_snapshot, save_snapshot
+from render import GridRenderer
+
 # Initialize Pygame
 pygame.init()
 
@@ -20,70 +25,89 @@ WHITE = (255, 255, 255)
 BLACK = (0, 0, 0)
 
 # Create a 2D array to store the state of each cell
-grid = np.zeros((rows, cols), dtype=int)
+grid = np.zeros((rows, cols), dtype=np.uint8)
+
+# Renderer that draws live cells black and dead cells white, with black gridlines
+renderer = GridRenderer(rows, cols, cell_size, [WHITE, BLACK], BLACK)
 
 # Function to draw the grid
 def draw_grid():
-    for y in range(rows):
-        for x in range(cols):
-            rect = pygame.Rect(x*cell_size, y*cell_size, cell_size, cell_size)
-            pygame.draw.rect(screen, BLACK if grid[y][x] else WHITE, rect)
-            pygame.draw.rect(screen, BLACK, rect, 1)
+    return renderer.update(screen, grid)
 
 # Function to toggle the state of a cell
 def toggle_cell(pos, state):
     x, y = pos[0] // cell_size, pos[1] // cell_size
     if 0 <= x < cols and 0 <= y < rows:  # Check if the position is within bounds
         grid[y][x] = state
+        scheduler.touch()  # Redraw on the next frame
+
+# Two preallocated buffers: each generation is written into the spare one and they swap
+stepper = BufferedStepper('life', grid)
+grid = stepper.grid
+
+# Snapshot file written by the 's' key and restored by the 'l' key
+snapshot_path = 'life.snap'
 
-# Function to apply the Game of Life rules
+# Function to apply the Game of Life rules (B3/S23) to the whole grid
 def apply_game_of_life_rules():
-    new_grid = np.zeros((rows, cols), dtype=int)
-    for y in range(rows):
-        for x in range(cols):
-            # Count the live neighbors
-            live_neighbors = sum([grid[y + i][x + j] for i in (-1, 0, 1) for j in (-1, 0, 1) if (i != 0 or j != 0) and (0 <= y + i < rows) and (0 <= x + j < cols)])
-            
-            # Apply the rules of the Game of Life
-            if grid[y][x] == 1 and live_neighbors < 2 or live_neighbors > 3:
-                new_grid[y][x] = 0  # Die
-            elif grid[y][x] == 0 and live_neighbors == 3:
-                new_grid[y][x] = 1  # Come to life
-            else:
-                new_grid[y][x] = grid[y][x]  # Stay the same
-    return new_grid
+    stepper.step()
+    return stepper.grid
 
 # Main loop
 running = True
-paused = True
+drawn_version = None  # scheduler.version of the state on screen
 drawing = False  # Variable to track if the mouse is being dragged
 clock = pygame.time.Clock()
 
+# Step on a background thread at its own rate, independent of the frame rate
+generations_per_second = 30
+scheduler = StepScheduler(apply_game_of_life_rules, generations_per_second)
+
+# Clear the window once; after that only changed cells are repainted
+screen.fill(WHITE)
+pygame.display.flip()
+
 while running:
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            running = False
-        elif event.type == pygame.MOUSEBUTTONDOWN:
-            drawing = True  # Start drawing when the mouse button is pressed
-            toggle_cell(pygame.mouse.get_pos(), 1)
-        elif event.type == pygame.MOUSEBUTTONUP:
-            drawing = False  # Stop drawing when the mouse button is released
-        elif event.type == pygame.MOUSEMOTION:
-            if drawing:  # If we're currently drawing, toggle cells as the mouse moves
-                toggle_cell(pygame.mouse.get_pos(), 1)
-        elif event.type == pygame.KEYDOWN:
-            if event.key == pygame.K_SPACE:
-                paused = not paused
-            elif event.key == pygame.K_r:  # Reset the game when 'r' is pressed
-                grid = np.zeros((rows, cols), dtype=int)
-
-    screen.fill(WHITE)
-
-    if not paused:
-        grid = apply_game_of_life_rules()
-
-    draw_grid()
-    pygame.display.flip()
+    # Poll input outside the lock so a generation in progress never delays it
+    events = pygame.event.get()
+
+    # Hold the stepping thread off while applying the input and drawing
+    with scheduler:
+        grid = stepper.grid  # The buffers trade places on every generation
+        for event in events:
+            if event.type == pygame.QUIT:
+                running = False
+            elif event.type == pygame.MOUSEBUTTONDOWN:
+                drawing = True  # Start drawing when the mouse button is pressed
+                toggle_cell(event.pos, 1)
+            elif event.type == pygame.MOUSEBUTTONUP:
+                drawing = False  # Stop drawing when the mouse button is released
+            elif event.type == pygame.MOUSEMOTION:
+                if drawing:  # If we're currently drawing, toggle cells as the mouse moves
+                    toggle_cell(event.pos, 1)
+            elif event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_SPACE:
+                    scheduler.paused = not scheduler.paused
+                elif event.key == pygame.K_r:  # Reset the game when 'r' is pressed
+                    grid[...] = 0  # Clear in place; the stepper owns the buffers
+                    scheduler.touch()
+                elif event.key == pygame.K_s:  # Save a snapshot when 's' is pressed
+                    save_snapshot(snapshot_path, 'life', grid, stepper.generation)
+                elif event.key == pygame.K_l:  # Restore the saved snapshot when 'l' is pressed
+                    try:
+                        stepper.generation = restore_snapshot(snapshot_path, 'life', grid)
+                        scheduler.touch()
+                    except (OSError, ValueError) as error:
+                        print(f"Could not load {snapshot_path}: {error}")
+
+        # Repaint only after a new generation or an edit, and only the cells that changed
+        dirty_rects = []
+        if scheduler.version != drawn_version:
+            drawn_version = scheduler.version
+            dirty_rects = draw_grid()
+    if dirty_rects:
+        pygame.display.update(dirty_rects)
     clock.tick(30)  # Increase the clock tick if the drawing feels unresponsive
 
+scheduler.close()
 pygame.quit()
@@ -0,0 +1,243 @@
+"""Run any of the rulesets for many generations without a display.
+
+Rulesets come from the ``simulation`` registry. Only NumPy and that package
+are imported, so this works on
+machines without pygame or a screen. Examples::
+
+    python headless.py life --size 4096x4096 --density 0.3 --steps 1000
+    python headless.py city3 --input start.npy --steps 10000 \
+        --snapshot-every 1000 --snapshot-dir runs/city3 --stats runs/city3.csv
+"""
+import argparse
+import csv
+import os
+import time
+
+import numpy as np
+
+from simulation import get_ruleset, ruleset_names
+from simulation.active import ActiveTileStepper
+from simulation.buffered import BufferedStepper
+from simulation.cycles import CycleDetector
+from simulation.parallel import SharedMemoryExecutor
+from simulation.recording import Recorder
+from simulation.snapshot import is_snapshot, load_snapshot, save_snapshot
+from simulation.spec import load_ruleset
+from simulation.storage import ENTROPY_DTYPE, STATE_DTYPE, as_entropy_grid, as_state_grid
+from simulation.threaded import ThreadedStepper
+
+def random_grid(shape, n_states, density, rng):
+    """Fill ``density`` of the cells with a uniformly chosen non-empty state."""
+    occupied = rng.random(shape) < density
+    return np.where(occupied, rng.integers(1, n_states, size=shape, dtype=STATE_DTYPE), STATE_DTYPE.type(0))
+
+
+def initial_state(ruleset, grid, entropy_grid=None):
+    """Build the state ``ruleset.step`` expects from a grid (and city4's entropy).
+
+    Raises ``ValueError`` if the grid holds values that are not states of the
+    ruleset or the entropy plane does not match it.
+    """
+    grid = as_state_grid(grid, ruleset.n_states)
+    if len(ruleset.planes) == 1:
+        return grid
+    if entropy_grid is None:
+        return grid, np.zeros(grid.shape, dtype=ENTROPY_DTYPE)
+    return grid, as_entropy_grid(entropy_grid, grid.shape)
+
+
+def run(name, state, steps, params=None, snapshot_every=0, snapshot_dir=None, stats_path=None, stats_every=1,
+        tile=None, workers=None, seed=None, threads=None, record_path=None, keyframe_every=100,
+        cycles=None, fast_forward=False, generation=0):
+    """Step ``state`` ``steps`` times with the ruleset ``name`` and return the final state.
+
+    ``state`` is generation ``generation`` of the run (non-zero when resuming
+    a snapshot); statistics, snapshots and recordings are numbered from it,
+    and stochastic rulesets continue the random draws of the original run.
+    Snapshots are written as ``<plane>_<generation>.npy`` for every plane of
+    the ruleset every ``snapshot_every`` generations. Statistics rows hold the
+    cell count of every state and the mean of every extra plane. With
+    ``tile`` set, only tiles of that size that can still change are stepped
+    (see ``simulation.active``); with ``workers`` set, bands of the grid are
+    stepped on that many processes (see ``simulation.parallel``), and with
+    ``threads`` set, on that many threads (see ``simulation.threaded``).
+    Stochastic rulesets draw per-cell random numbers keyed by ``seed``, the
+    generation and the cell (see ``simulation.streams``), so all of these
+    give the same result for the same seed. With ``record_path`` set,
+    every generation is recorded there with a keyframe every
+    ``keyframe_every`` generations (see ``simulation.recording``).
+
+    With ``cycles`` (a ``simulation.cycles.CycleDetector``) the run stops at
+    the first generation that repeats an earlier one, and the detector holds
+    the period. With ``fast_forward`` it then skips to the state generation
+    ``steps`` would have, stepping at most one period more.
+    """
+    ruleset = get_ruleset(name)
+    params = ruleset.params(params)
+    multi_plane = len(ruleset.planes) > 1
+    if cycles and ruleset.stochastic:
+        raise ValueError(f"ruleset {name!r} is stochastic and cannot cycle")
+    if snapshot_dir:
+        os.makedirs(snapshot_dir, exist_ok=True)
+
+    first_generation = generation
+    if tile:
+        stepper = ActiveTileStepper(name, state, params, tile, generation=first_generation)
+    elif workers:
+        stepper = SharedMemoryExecutor(name, state, params, workers, seed=seed, generation=first_generation)
+    elif threads:
+        stepper = ThreadedStepper(name, state, params, threads, seed=seed, generation=first_generation)
+    else:
+        stepper_class = ruleset.stepper or BufferedStepper
+        stepper = stepper_class(name, state, params, seed=seed, generation=first_generation)
+    recorder = None
+    if record_path:
+        recorder = Recorder(record_path, name, state, first_generation, keyframe_every, planes=ruleset.planes)
+    stats_file = open(stats_path, 'w', newline='') if stats_path else None
+    try:
+        writer = None
+        if stats_file:
+            writer = csv.writer(stats_file)
+            header = ['generation'] + [f'state_{value}' for value in range(ruleset.n_states)]
+            writer.writerow(header + [f'mean_{plane}' for plane in ruleset.planes[1:]])
+
+        last_generation = first_generation + steps
+        generation = first_generation
+        while True:
+            write_stats = writer and generation % stats_every == 0
+            write_snapshot = snapshot_dir and snapshot_every and generation % snapshot_every == 0
+            if write_stats or write_snapshot:
+                state = stepper.state
+                planes = state if multi_plane else (state,)
+            if write_stats:
+                row = [generation] + np.bincount(planes[0].ravel(), minlength=ruleset.n_states).tolist()
+                writer.writerow(row + [float(plane.mean()) for plane in planes[1:]])
+            if write_snapshot:
+                for plane_name, plane in zip(ruleset.planes, planes):
+                    np.save(os.path.join(snapshot_dir, f'{plane_name}_{generation:08d}.npy'), plane)
+            if cycles and cycles.observe(generation, stepper.state):
+                break
+            if generation == last_generation:
+                break
+
+            # Step straight to the next generation that is looked at, so that steppers such as
+            # Hashlife's can jump ahead
+            ahead = 1 if recorder or cycles else last_generation - generation
+            if writer:
+                ahead = min(ahead, stats_every - generation % stats_every)
+            if snapshot_dir and snapshot_every:
+                ahead = min(ahead, snapshot_every - generation % snapshot_every)
+            stepper.step(ahead)
+            generation += ahead
+            if recorder:
+                recorder.append(stepper.state)
+
+        if cycles and cycles.period and fast_forward:
+            # The run repeats every period generations: only the remainder needs stepping
+            stepper.step(cycles.steps_to(last_generation, generation))
+        state = stepper.state
+    finally:
+        if stats_file:
+            stats_file.close()
+        if recorder:
+            recorder.close()
+        if isinstance(stepper, (SharedMemoryExecutor, ThreadedStepper)):
+            stepper.close()
+
+    return state
+
+
+def parse_size(text):
+    rows, cols = text.lower().split('x')
+    return int(rows), int(cols)
+
+
+def main(argv=None):
+    # Register the rulesets of --spec files first so they are valid choices
+    specs = argparse.ArgumentParser(add_help=False)
+    specs.add_argument('--spec', action='append', default=[])
+    for path in specs.parse_known_args(argv)[0].spec:
+        try:
+            load_ruleset(path)
+        except (OSError, ValueError) as error:
+            specs.error(str(error))
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('ruleset', choices=ruleset_names())
+    parser.add_argument('--spec', action='append', default=[], metavar='FILE',
+                        help='load a JSON or TOML ruleset spec (see simulation.spec); may be repeated')
+    parser.add_argument('--steps', type=int, default=100, help='generations to run')
+    parser.add_argument('--input', help='initial grid as a .npy file, or a snapshot to resume')
+    parser.add_argument('--entropy', help='initial entropy grid as a .npy file (city4 only)')
+    parser.add_argument('--size', type=parse_size, default=(56, 80), help='ROWSxCOLS of a random initial grid')
+    parser.add_argument('--density', type=float, default=0.3, help='fraction of occupied cells in a random grid')
+    parser.add_argument('--seed', type=int, help='seed for the random grid and stochastic rules')
+    parser.add_argument('--snapshot-every', type=int, default=0, help='save the grid every N generations')
+    parser.add_argument('--snapshot-dir', help='directory for snapshots')
+    parser.add_argument('--stats', help='CSV file for per-generation statistics')
+    parser.add_argument('--stats-every', type=int, default=1, help='write statistics every N generations')
+    parser.add_argument('--active-tiles', type=int, metavar='SIZE',
+                        help='only step SIZExSIZE tiles that can still change (deterministic rulesets)')
+    parser.add_argument('--workers', type=int, help='step bands of the grid on this many processes')
+    parser.add_argument('--threads', type=int, help='step bands of the grid on this many threads')
+    parser.add_argument('--record', help='record every generation to this file (see simulation.recording)')
+    parser.add_argument('--keyframe-every', type=int, default=100, help='full keyframe every N recorded generations')
+    parser.add_argument('--detect-cycles', type=int, default=0, metavar='HISTORY',
+                        help='stop once a generation repeats one of the last HISTORY (deterministic rulesets)')
+    parser.add_argument('--fast-forward', action='store_true',
+                        help='after a detected cycle, skip to the state of the last generation instead of stopping')
+    parser.add_argument('--output', help='save the final grid as a .npy file, or the whole state as a .snap snapshot')
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(args.seed)
+    ruleset = get_ruleset(args.ruleset)
+    first_generation = 0
+    if args.input and is_snapshot(args.input):
+        snapshot = load_snapshot(args.input)
+        if snapshot.ruleset != args.ruleset:
+            parser.error(f'{args.input} holds a {snapshot.ruleset} snapshot')
+        planes = tuple(snapshot.planes.values())
+        grid, entropy_grid = planes[0], planes[1] if len(planes) > 1 else None
+        first_generation = snapshot.generation
+    else:
+        grid = np.load(args.input) if args.input else random_grid(args.size, ruleset.n_states, args.density, rng)
+        entropy_grid = np.load(args.entropy) if args.entropy else None
+    state = initial_state(ruleset, grid, entropy_grid)
+
+    if args.stats_every < 1:
+        parser.error('--stats-every must be at least 1')
+    if args.keyframe_every < 1:
+        parser.error('--keyframe-every must be at least 1')
+    if args.fast_forward and not args.detect_cycles:
+        parser.error('--fast-forward needs --detect-cycles')
+    if args.active_tiles and (ruleset.stochastic or len(ruleset.planes) > 1):
+        parser.error(f'--active-tiles needs a deterministic single-plane ruleset, not {args.ruleset}')
+    if args.detect_cycles and ruleset.stochastic:
+        parser.error(f'{args.ruleset} is stochastic and cannot cycle')
+    cycles = CycleDetector(args.detect_cycles) if args.detect_cycles else None
+
+    start = time.perf_counter()
+    state = run(args.ruleset, state, args.steps, None, args.snapshot_every, args.snapshot_dir,
+                args.stats, args.stats_every, args.active_tiles, args.workers, args.seed, args.threads,
+                args.record, args.keyframe_every, cycles, args.fast_forward, first_generation)
+    elapsed = time.perf_counter() - start
+    steps = args.steps
+    if cycles and cycles.period:
+        detected = cycles.start + cycles.period
+        outcome = f'skipped to generation {steps}' if args.fast_forward else 'stopped'
+        print(f'{args.ruleset}: cycle of period {cycles.period} from generation {cycles.start} '
+              f'found at generation {detected}; {outcome}')
+        steps = steps if args.fast_forward else detected - first_generation
+
+    grid = state[0] if len(ruleset.planes) > 1 else state
+    if args.output and args.output.endswith('.snap'):
+        save_snapshot(args.output, args.ruleset, state, first_generation + steps, ruleset.planes)
+    elif args.output:
+        np.save(args.output, grid)
+    rate = steps / elapsed if elapsed > 0 else float('inf')
+    print(f'{args.ruleset}: {steps} generations of {grid.shape[0]}x{grid.shape[1]} '
+          f'in {elapsed:.3f}s ({rate:.1f} gen/s)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,159 @@
+"""Array-based grid rendering shared by the pygame scripts.
+
+Instead of two ``pygame.draw.rect`` calls per cell, the state grid is mapped
+through a color lookup table into an RGB array with one pixel per cell,
+uploaded with ``pygame.surfarray.blit_array`` and scaled up to the board in a
+single blit. The gridlines never change, so they are drawn once onto a
+cached overlay.
+
+``GridRenderer.update`` goes further and diffs the grid against the one it
+drew last, repainting only the cells that changed and returning the dirty
+rectangles for ``pygame.display.update``.
+"""
+from collections import OrderedDict
+
+import numpy as np
+import pygame
+
+# Key color for the transparent part of the gridline overlay
+_OVERLAY_KEY = (255, 0, 255)
+
+
+def color_table(module_types, module_colors, empty_color):
+    """Build a ``(n_states, 3)`` uint8 lookup table indexed by cell state."""
+    table = np.zeros((max(module_types.values()) + 1, 3), dtype=np.uint8)
+    table[:] = empty_color
+    for module, value in module_types.items():
+        table[value] = module_colors[module]
+    return table
+
+
+class GlyphCache:
+    """Rendered text surfaces, keyed by string, with least-recently-used eviction."""
+
+    def __init__(self, font, color, max_entries=256):
+        self.font, self.color, self.max_entries = font, color, max_entries
+        self._surfaces = OrderedDict()
+
+    def get(self, text):
+        surface = self._surfaces.get(text)
+        if surface is None:
+            surface = self.font.render(text, True, self.color)
+            self._surfaces[text] = surface
+            if len(self._surfaces) > self.max_entries:
+                self._surfaces.popitem(last=False)
+        else:
+            self._surfaces.move_to_end(text)
+        return surface
+
+
+class GridRenderer:
+    """Draw a ``(rows, cols)`` state grid at ``cell_size`` pixels per cell."""
+
+    def __init__(self, rows, cols, cell_size, colors, line_color=None, origin=(0, 0), max_dirty=1024):
+        self.rows, self.cols, self.cell_size = rows, cols, cell_size
+        self.origin = origin
+        # Above this many changed cells a full redraw is cheaper than per-cell repaints
+        self.max_dirty = max_dirty
+        self.lut = np.asarray(colors, dtype=np.uint8)
+        self.rect = pygame.Rect(origin, (cols * cell_size, rows * cell_size))
+        # One pixel per cell, laid out (x, y) like pygame.surfarray expects
+        self._pixels = np.zeros((cols, rows, 3), dtype=np.uint8)
+        self._cells = pygame.Surface((cols, rows))
+        self._scaled = pygame.Surface(self.rect.size)
+        self._gridlines = None if line_color is None else self._render_gridlines(line_color)
+        self._drawn = None
+
+    def _render_gridlines(self, line_color):
+        # Same pixels as a 1px pygame.draw.rect outline around every cell
+        overlay = pygame.Surface(self.rect.size)
+        overlay.fill(_OVERLAY_KEY)
+        size, width, height = self.cell_size, self.rect.width, self.rect.height
+        for x in range(self.cols):
+            pygame.draw.line(overlay, line_color, (x * size, 0), (x * size, height - 1))
+            pygame.draw.line(overlay, line_color, (x * size + size - 1, 0), (x * size + size - 1, height - 1))
+        for y in range(self.rows):
+            pygame.draw.line(overlay, line_color, (0, y * size), (width - 1, y * size))
+            pygame.draw.line(overlay, line_color, (0, y * size + size - 1), (width - 1, y * size + size - 1))
+        overlay.set_colorkey(_OVERLAY_KEY)
+        return overlay
+
+    def cell_rect(self, y, x):
+        """Screen rectangle covered by cell ``(y, x)``."""
+        size = self.cell_size
+        return pygame.Rect(self.origin[0] + x * size, self.origin[1] + y * size, size, size)
+
+    def draw(self, screen, grid):
+        """Draw the whole grid onto ``screen``."""
+        self._drawn = np.array(grid, copy=True)
+        np.take(self.lut, grid.T, axis=0, out=self._pixels, mode='clip')
+        pygame.surfarray.blit_array(self._cells, self._pixels)
+        pygame.transform.scale(self._cells, self.rect.size, self._scaled)
+        screen.blit(self._scaled, self.origin)
+        if self._gridlines is not None:
+            screen.blit(self._gridlines, self.origin)
+
+    def update(self, screen, grid, also=None):
+        """Repaint the cells that changed since the last draw and return the dirty rects.
+
+        ``also`` is an optional boolean mask of cells to repaint even if their
+        state is unchanged. Returns an empty list when nothing needs pushing.
+        """
+        if self._drawn is None or self._drawn.shape != grid.shape:
+            self.draw(screen, grid)
+            return [self.rect]
+        changed = grid != self._drawn
+        if also is not None:
+            changed |= also
+        ys, xs = np.nonzero(changed)
+        if len(ys) == 0:
+            return []
+        if len(ys) > self.max_dirty:
+            self.draw(screen, grid)
+            return [self.rect]
+        rects = []
+        for y, x in zip(ys.tolist(), xs.tolist()):
+            rect = self.cell_rect(y, x)
+            screen.fill(self.lut[grid[y, x]].tolist(), rect)
+            if self._gridlines is not None:
+                screen.blit(self._gridlines, rect, rect.move(-self.origin[0], -self.origin[1]))
+            rects.append(rect)
+        np.copyto(self._drawn, grid)
+        return rects
+
+
+class CellLabels:
+    """Numeric labels centred in the cells of a ``GridRenderer``.
+
+    Values are quantized to ``decimals`` places. The labels live on their own
+    transparent layer and only cells whose displayed text changed since the
+    last frame are re-rendered onto it.
+    """
+
+    def __init__(self, renderer, font, color, decimals=2, max_glyphs=256):
+        self.renderer, self.decimals = renderer, decimals
+        self.glyphs = GlyphCache(font, color, max_glyphs)
+        self._scale = 10 ** decimals
+        self._shown = np.full((renderer.rows, renderer.cols), -1, dtype=np.int64)
+        self._layer = pygame.Surface(renderer.rect.size, pygame.SRCALPHA)
+
+    def update(self, values):
+        """Re-render labels whose text changed and return a mask of those cells."""
+        keys = np.rint(np.asarray(values) * self._scale).astype(np.int64)
+        changed = keys != self._shown
+        size = self.renderer.cell_size
+        for y, x in zip(*np.nonzero(changed)):
+            rect = pygame.Rect(x * size, y * size, size, size)
+            self._layer.fill((0, 0, 0, 0), rect)
+            text = self.glyphs.get(f"{keys[y, x] / self._scale:.{self.decimals}f}")
+            self._layer.set_clip(rect)
+            self._layer.blit(text, text.get_rect(center=rect.center))
+            self._layer.set_clip(None)
+        self._shown = keys
+        return changed
+
+    def blit(self, screen, rects):
+        """Copy the label layer onto ``screen`` inside ``rects``."""
+        origin = self.renderer.origin
+        for rect in rects:
+            screen.blit(self._layer, rect, rect.move(-origin[0], -origin[1]))
@@ -0,0 +1,9 @@
+"""Vectorized cellular automaton engines shared by the pygame scripts.
+
+Only NumPy is required. Rulesets are looked up by name::
+
+    from simulation import get_ruleset
+    life = get_ruleset('life')
+    grid = life.step(grid)
+"""
+from simulation.registry import Ruleset, get_ruleset, register_ruleset, ruleset_names
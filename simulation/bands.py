@@ -0,0 +1,58 @@
+"""Row-band helpers shared by the parallel executors.
+
+A band ``[start, stop)`` of rows is stepped together with one halo row
+above and below it, so the cells at its edges see their real neighbours;
+only the band's own rows are written back. Stochastic rulesets take the
+draws of the band's cells, halo included, from ``simulation.streams``, so
+the cut into bands never changes the result.
+"""
+import numpy as np
+
+from simulation.streams import CellStreams
+
+
+def split_bands(rows, bands):
+    """Split ``rows`` into ``bands`` contiguous ``(start, stop)`` ranges of near-equal size."""
+    bands = max(1, min(bands, rows))
+    edges = np.linspace(0, rows, bands + 1).astype(int).tolist()
+    return list(zip(edges[:-1], edges[1:]))
+
+
+def band_streams(ruleset, params, seed):
+    """Return the ``CellStreams`` the bands of a stochastic ruleset draw from, or ``None``.
+
+    One generator cannot be shared by bands stepped in parallel without the
+    result depending on their order (and each process would get a copy of
+    it), so an explicit ``params['rng']`` is refused with ``ValueError``:
+    pass ``seed`` instead.
+    """
+    if not ruleset.stochastic:
+        return None
+    if params.get('rng') is not None:
+        raise ValueError(f"ruleset {ruleset.name!r} is stepped in bands, which draw from counter-based streams; "
+                         "pass seed= instead of params['rng']")
+    return CellStreams(seed)
+
+
+def step_band(ruleset, params, source, target, start, stop, work=None, streams=None, generation=0):
+    """Step rows ``start:stop`` of the planes in ``source`` into the same rows of ``target``.
+
+    A ``Workspace`` kept for the band lets buffered rulesets step it without
+    allocating. With ``streams`` (a ``CellStreams``), the band draws the
+    random numbers of its cells in ``generation``.
+    """
+    rows, cols = source[0].shape
+    lo, hi = max(start - 1, 0), min(stop + 1, rows)
+    if streams is not None:
+        params = dict(params, rng=streams.generator(generation, lo * cols))
+    band = tuple(plane[lo:hi] for plane in source)
+    multi_plane = len(band) > 1
+    if ruleset.buffered and work is not None:
+        out = tuple(work.array(f'band_{k}', plane.shape, plane.dtype) for k, plane in enumerate(band))
+        result = ruleset.step(band if multi_plane else band[0], params,
+                              out=out if multi_plane else out[0], work=work)
+    else:
+        result = ruleset.step(band if multi_plane else band[0], params)
+    result = result if multi_plane else (result,)
+    for plane, new in zip(target, result):
+        np.copyto(plane[start:stop], new[start - lo:stop - lo])
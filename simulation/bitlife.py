@@ -0,0 +1,131 @@
+"""Bit-packed Game of Life: 64 cells per uint64 word.
+
+Row ``r`` of a packed board is an array of words; bit ``b`` of word ``w``
+holds cell ``(r, 64 * w + b)``. A generation is computed for 64 cells at a
+time with bitwise full-adder logic, so memory is 1/64 of a one-byte-per-cell
+grid. Cells beyond the edge of the board are dead, as in game.py.
+"""
+import numpy as np
+
+from simulation.registry import Ruleset, register_ruleset
+
+WORD_BITS = 64
+_WORD = np.dtype('<u8')
+# Words per block of rows, sized so a block's scratch planes stay in cache
+_BLOCK_WORDS = 32768
+
+
+def pack(grid):
+    """Pack a ``(rows, cols)`` 0/1 grid into a ``(rows, ceil(cols / 64))`` uint64 board."""
+    grid = np.asarray(grid)
+    rows, cols = grid.shape
+    words = -(-cols // WORD_BITS)
+    packed = np.zeros((rows, words * 8), dtype=np.uint8)
+    packed[:, :-(-cols // 8)] = np.packbits(grid != 0, axis=1, bitorder='little')
+    return packed.view(_WORD)
+
+
+def unpack(board, cols):
+    """Inverse of ``pack``: return the ``(rows, cols)`` uint8 grid."""
+    return np.unpackbits(board.view(np.uint8), axis=1, count=cols, bitorder='little')
+
+
+def _edge_mask(cols, words):
+    # Valid bits of the last word; everything past ``cols`` must stay dead
+    mask = np.full(words, np.iinfo(np.uint64).max, dtype=_WORD)
+    spare = words * WORD_BITS - cols
+    if spare:
+        mask[-1] = np.uint64(mask[-1]) >> np.uint64(spare)
+    return mask
+
+
+def _shifted(rows, out_west, out_east):
+    # West/east neighbour planes: bit b of the result holds cell b-1 (west) or b+1 (east)
+    one, top = np.uint64(1), np.uint64(WORD_BITS - 1)
+    np.left_shift(rows, one, out=out_west)
+    out_west[..., 1:] |= rows[..., :-1] >> top
+    np.right_shift(rows, one, out=out_east)
+    out_east[..., :-1] |= rows[..., 1:] << top
+
+
+def step_packed(board, cols, out=None, block_rows=None):
+    """Advance a packed board by one generation.
+
+    Rows are processed in cache-sized blocks (``block_rows`` rows at a time)
+    with scratch planes reused between blocks, so temporaries stay small even
+    for very large universes. ``out`` may be given to avoid allocating the
+    result; it must not alias ``board``.
+    """
+    rows, words = board.shape
+    if out is None:
+        out = np.empty_like(board)
+    if block_rows is None:
+        block_rows = max(1, _BLOCK_WORDS // words)
+    block_rows = min(block_rows, rows)
+    mask = _edge_mask(cols, words)
+
+    # Scratch planes for one block plus its two halo rows
+    padded, west, east, h0, h1 = (np.empty((block_rows + 2, words), dtype=_WORD) for _ in range(5))
+    m0, m1, s0, c0, p, q, tmp = (np.empty((block_rows, words), dtype=_WORD) for _ in range(7))
+
+    for start in range(0, rows, block_rows):
+        stop = min(start + block_rows, rows)
+        n = stop - start
+        # Block plus one halo row on each side (zero rows beyond the board)
+        padded[:n + 2] = 0
+        lo, hi = max(start - 1, 0), min(stop + 1, rows)
+        padded[lo - start + 1:hi - start + 1] = board[lo:hi]
+        P, W, E = padded[:n + 2], west[:n + 2], east[:n + 2]
+        _shifted(P, W, E)
+
+        # Horizontal sums of three (west, centre, east) as two bit planes
+        H0, H1 = h0[:n + 2], h1[:n + 2]
+        np.bitwise_xor(W, P, out=H0)
+        np.bitwise_and(E, H0, out=H1)
+        H0 ^= E
+        H1 |= W & P
+        # Same row: only west and east count
+        M0, M1 = m0[:n], m1[:n]
+        np.bitwise_xor(W[1:-1], E[1:-1], out=M0)
+        np.bitwise_and(W[1:-1], E[1:-1], out=M1)
+        a0, a1 = H0[:-2], H1[:-2]   # row above
+        b0, b1 = H0[2:], H1[2:]     # row below
+
+        # Add the three 2-bit numbers; s0..s2 are the low bits of the neighbour count
+        S0, C0, T = s0[:n], c0[:n], tmp[:n]
+        np.bitwise_xor(a0, b0, out=T)
+        np.bitwise_xor(T, M0, out=S0)
+        np.bitwise_and(M0, T, out=C0)
+        np.bitwise_and(a0, b0, out=T)
+        C0 |= T
+        Pp, Q = p[:n], q[:n]
+        np.bitwise_xor(a1, b1, out=Pp)
+        np.bitwise_and(a1, b1, out=Q)
+        # r = m1 ^ c0 and t = m1 & c0, reusing the m0 buffer for t
+        np.bitwise_and(M1, C0, out=M0)
+        M1 ^= C0
+        # s2 = q ^ t ^ (p & r), kept in Q
+        Q ^= M0
+        np.bitwise_and(Pp, M1, out=T)
+        Q ^= T
+        # s1 = p ^ r, kept in Pp
+        Pp ^= M1
+
+        # Alive next if the count is 3, or 2 and the cell is alive (a count of 8 has s1 == 0)
+        result = out[start:stop]
+        np.bitwise_or(S0, P[1:-1], out=result)
+        result &= Pp
+        np.invert(Q, out=Q)
+        result &= Q
+        result &= mask
+    return out
+
+
+def bitlife_step(grid, params=None):
+    """Dense ``step`` wrapper: pack, advance one generation, unpack."""
+    board = step_packed(pack(grid), grid.shape[1])
+    return unpack(board, grid.shape[1]).astype(grid.dtype)
+
+
+register_ruleset(Ruleset('life-bitpacked', bitlife_step, 2,
+                         description="game.py's Life on a bit-packed uint64 board"))
@@ -0,0 +1,135 @@
+"""Compile rulesets into dense lookup tables.
+
+The rules of life, city.py, city2.py and city3.py decide a cell's next
+state from nothing but its own state and how many of its eight neighbours
+hold each non-empty state. With at most eight neighbours every count is
+0..8, so the whole rule fits in a uint8 table indexed by
+``(state, count_1, ..., count_N)``. Stepping then costs one neighbour
+histogram and one gather per cell, whatever the rules look like.
+
+The table is built by running the ruleset's own step function once on a
+grid of 3x3 patches, one per feasible combination: the centre of each patch
+sees exactly the neighbours of its combination. Combinations whose counts
+add up to more than eight never occur and map to 0.
+
+The table holds ``n_states * 9 ** (n_states - 1)`` entries, so at most
+``MAX_COUNTED_STATES`` non-empty states are accepted (a table of under 4 MB).
+
+A rule qualifies only if empty neighbours count the same as cells beyond
+the edge of the board. city2-green does not (it counts every neighbour on
+the board), which ``compile_ruleset`` detects by checking the table against
+the original on a random grid.
+
+The ``-lut`` versions of life, city, city2 and city3 are registered as
+factories and compiled on their first lookup.
+"""
+from functools import partial
+
+import numpy as np
+
+from simulation.kernels import Workspace
+from simulation.registry import Ruleset, get_ruleset, register_factory, register_ruleset
+
+# Possible neighbour counts per state: 0..8
+RADIX = 9
+# Most non-empty states a ruleset may have to be compiled
+MAX_COUNTED_STATES = 6
+
+
+def _count_vectors(counted):
+    # Every (count_1, ..., count_N) adding up to at most 8, grown one state at a time so that only the
+    # C(8 + N, N) feasible vectors are ever built
+    vectors = np.zeros((1, 0), dtype=np.int64)
+    for _ in range(counted):
+        room = 8 - vectors.sum(axis=1)
+        vectors = np.concatenate([
+            np.column_stack([vectors[room >= count], np.full(np.count_nonzero(room >= count), count)])
+            for count in range(RADIX)])
+    return vectors
+
+
+def _patches(n_states):
+    # Every (state, count_1, ..., count_N) with the counts adding up to at most 8
+    counted = n_states - 1
+    vectors = _count_vectors(counted)
+    combinations = np.column_stack([np.repeat(np.arange(n_states), len(vectors)), np.tile(vectors, (n_states, 1))])
+    # Fill the eight neighbour slots: count_1 cells of state 1, then count_2 of state 2, ...; the rest empty
+    ends = np.cumsum(combinations[:, 1:], axis=1)
+    slots = (np.arange(8)[np.newaxis, :, np.newaxis] >= ends[:, np.newaxis, :]).sum(axis=2) + 1
+    slots[slots > counted] = 0
+    patches = np.empty((len(combinations), 3, 3), dtype=np.uint8)
+    patches.reshape(-1, 9)[:, [0, 1, 2, 3, 5, 6, 7, 8]] = slots
+    patches[:, 1, 1] = combinations[:, 0]
+    return combinations, patches
+
+
+def compile_table(step, n_states, params=None):
+    """Return the flat uint8 transition table of ``step`` for ``n_states`` states."""
+    combinations, patches = _patches(n_states)
+    # Lay the patches side by side; each centre's neighbours all lie in its own patch
+    grid = np.ascontiguousarray(patches.transpose(1, 0, 2)).reshape(3, -1)
+    result = step(grid, params)
+    centres = np.asarray(result)[1, 1::3]
+
+    table = np.zeros(n_states * RADIX ** (n_states - 1), dtype=np.uint8)
+    index = combinations[:, 0]
+    for column in range(1, n_states):
+        index = index * RADIX + combinations[:, column]
+    table[index] = centres
+    return table
+
+
+def table_step(grid, params=None, out=None, work=None, defaults=None):
+    """Step ``grid`` with the lookup table in ``params['table']``.
+
+    Compiled rulesets bind their own ``table`` and ``n_states`` as
+    ``defaults``, which apply when ``params`` holds no table.
+    """
+    if params is None or 'table' not in params:
+        params = defaults
+    table = params['table']
+    out = np.empty_like(grid) if out is None else out
+    work = Workspace() if work is None else work
+    counts = work.histogram(grid, list(range(1, params['n_states'])))
+    # Mixed-radix index (state, count_1, ..., count_N), built in place; intp so np.take need not convert it
+    index = work.array('index', grid.shape, np.intp)
+    np.copyto(index, grid, casting='unsafe')
+    for count in counts:
+        index *= RADIX
+        index += count
+    return np.take(table, index, out=out, mode='clip')
+
+
+def compile_ruleset(name, params=None, compiled_name=None, check_shape=(64, 64), seed=0):
+    """Compile the ruleset ``name`` into a table-driven ruleset and register it.
+
+    ``name`` may also be an unregistered ``Ruleset``. The compiled ruleset
+    is registered as ``compiled_name`` (``<name>-lut`` by default) and
+    returned. Raises ``ValueError`` if the ruleset is stochastic or
+    multi-plane, has more than ``MAX_COUNTED_STATES`` non-empty states, or
+    if the table disagrees with the original on a random ``check_shape``
+    grid.
+    """
+    ruleset = name if isinstance(name, Ruleset) else get_ruleset(name)
+    name = ruleset.name
+    if len(ruleset.planes) != 1 or ruleset.stochastic:
+        raise ValueError(f"ruleset {name!r} is not a deterministic single-plane ruleset")
+    if ruleset.n_states - 1 > MAX_COUNTED_STATES:
+        raise ValueError(f"ruleset {name!r} has {ruleset.n_states - 1} non-empty states; "
+                         f"at most {MAX_COUNTED_STATES} can be compiled")
+    params = ruleset.params(params)
+    table = compile_table(ruleset.step, ruleset.n_states, params)
+    defaults = {'table': table, 'n_states': ruleset.n_states}
+    compiled = Ruleset(compiled_name or f'{name}-lut', partial(table_step, defaults=defaults), ruleset.n_states,
+                       defaults, buffered=True, description=f'{ruleset.description}, compiled to a lookup table')
+
+    rng = np.random.default_rng(seed)
+    grid = rng.integers(0, ruleset.n_states, size=check_shape, dtype=np.uint8)
+    if not np.array_equal(compiled.step(grid), ruleset.step(grid, params)):
+        raise ValueError(f"ruleset {name!r} depends on more than the cell's state and its neighbour counts")
+    return register_ruleset(compiled)
+
+
+# Built on first lookup, so importing the registry stays fast
+for _name in ('life', 'city', 'city2', 'city3'):
+    register_factory(f'{_name}-lut', partial(compile_ruleset, _name))
@@ -0,0 +1,57 @@
+"""Detect still lifes and oscillations by hashing every generation.
+
+The city2 and city3 rulesets often settle into a fixed point or a short
+cycle. ``CycleDetector`` keeps the hashes of the last ``history``
+generations; once a generation hashes like one of them the run is periodic
+from there on, and any later generation can be found without stepping: it
+equals the generation ``(n - start) % period`` steps into the cycle.
+
+Hashes are 128-bit BLAKE2b digests of the raw planes, so a false match is
+not a practical concern. Only deterministic rulesets can be fast-forwarded
+this way.
+"""
+from collections import deque
+from hashlib import blake2b
+
+import numpy as np
+
+
+def state_hash(state):
+    """Return a 128-bit digest of a grid or tuple of planes."""
+    digest = blake2b(digest_size=16)
+    for plane in state if isinstance(state, tuple) else (state,):
+        digest.update(np.ascontiguousarray(plane).data)
+    return digest.digest()
+
+
+class CycleDetector:
+    """Find the first repeated generation among the last ``history`` observed.
+
+    After a repeat, ``start`` is the first generation of the cycle and
+    ``period`` its length (1 for a still life); both are ``None`` before.
+    """
+
+    def __init__(self, history=64):
+        self.history = history
+        self.start = self.period = None
+        self._seen = {}
+        self._order = deque()
+
+    def observe(self, generation, state):
+        """Record ``state`` as ``generation`` and return the period once the run repeats."""
+        if self.period is not None:
+            return self.period
+        key = state_hash(state)
+        earlier = self._seen.get(key)
+        if earlier is not None:
+            self.start, self.period = earlier, generation - earlier
+            return self.period
+        self._seen[key] = generation
+        self._order.append(key)
+        if len(self._order) > self.history:
+            del self._seen[self._order.popleft()]
+        return None
+
+    def steps_to(self, generation, current):
+        """Steps needed from ``current`` (inside the cycle) to reach the state of ``generation``."""
+        return (generation - current) % self.period
@@ -0,0 +1,296 @@
+"""Hashlife backend for game.py's Game of Life.
+
+The universe is a hash-consed quadtree: identical sub-squares anywhere in
+space or time are the same node, and the result of advancing a node is
+memoized, so regular patterns can be jumped ``2**k`` generations in one
+call. Coordinates are unbounded Python integers.
+
+The node table and the memo are capped at ``max_nodes`` entries together,
+also in the middle of a large jump: once they exceed it the memo is dropped,
+and the table too if it alone is over the cap (both are only caches; the
+recursion keeps every node it still needs). After each step everything not
+reachable from the current universe is dropped (a simple mark-and-rebuild
+collection). The reachable universe itself cannot be dropped, so when it
+grows past half of ``max_nodes`` the cap follows it, to twice its size.
+A cap below what a single jump needs keeps memory bounded at the price of
+recomputing dropped results, which can make that jump very slow.
+"""
+import numpy as np
+
+from simulation.registry import Ruleset, get_ruleset, register_ruleset
+
+
+class _Node:
+    __slots__ = ('nw', 'ne', 'sw', 'se', 'level', 'population')
+
+    def __init__(self, nw, ne, sw, se, level, population):
+        self.nw, self.ne, self.sw, self.se = nw, ne, sw, se
+        self.level, self.population = level, population
+
+
+# The two level-0 nodes: single dead and live cells
+_OFF = _Node(None, None, None, None, 0, 0)
+_ON = _Node(None, None, None, None, 0, 1)
+
+
+class HashLife:
+    """An unbounded Life universe stepped with Hashlife.
+
+    ``cells`` is an iterable of live ``(y, x)`` coordinates.
+    """
+
+    def __init__(self, cells=(), max_nodes=1 << 20):
+        self.max_nodes = max_nodes
+        self._limit = max_nodes
+        self.generation = 0
+        self._table = {}
+        self._memo = {}
+        self._empty = [_OFF]
+        cells = np.asarray(list(cells), dtype=object).reshape(-1, 2)
+        if len(cells):
+            y0, x0 = min(cells[:, 0]), min(cells[:, 1])
+            extent = max(max(cells[:, 0]) - y0, max(cells[:, 1]) - x0) + 1
+            level = max(int(extent - 1).bit_length(), 1)
+            self._root = self._build(cells, level, y0, x0)
+            self._origin = (y0, x0)
+        else:
+            self._root = self._empty_node(1)
+            self._origin = (0, 0)
+
+    @classmethod
+    def from_grid(cls, grid, origin=(0, 0), max_nodes=1 << 20):
+        """Build a universe from the live cells of a dense grid placed at ``origin``."""
+        ys, xs = np.nonzero(np.asarray(grid))
+        return cls(zip((ys + origin[0]).tolist(), (xs + origin[1]).tolist()), max_nodes)
+
+    @property
+    def population(self):
+        return self._root.population
+
+    # Node construction
+
+    def _join(self, nw, ne, sw, se):
+        key = (nw, ne, sw, se)
+        node = self._table.get(key)
+        if node is None:
+            node = _Node(nw, ne, sw, se, nw.level + 1,
+                         nw.population + ne.population + sw.population + se.population)
+            self._table[key] = node
+        return node
+
+    def _empty_node(self, level):
+        while len(self._empty) <= level:
+            child = self._empty[-1]
+            self._empty.append(self._join(child, child, child, child))
+        return self._empty[level]
+
+    def _build(self, cells, level, y0, x0):
+        if len(cells) == 0:
+            return self._empty_node(level)
+        if level == 0:
+            return _ON
+        half = 1 << (level - 1)
+        south = (cells[:, 0] >= y0 + half).astype(bool)
+        east = (cells[:, 1] >= x0 + half).astype(bool)
+        return self._join(
+            self._build(cells[~south & ~east], level - 1, y0, x0),
+            self._build(cells[~south & east], level - 1, y0, x0 + half),
+            self._build(cells[south & ~east], level - 1, y0 + half, x0),
+            self._build(cells[south & east], level - 1, y0 + half, x0 + half),
+        )
+
+    def _expand(self, node):
+        # Same pattern, one level up, centred in an empty border
+        empty = self._empty_node(node.level - 1)
+        return self._join(
+            self._join(empty, empty, empty, node.nw),
+            self._join(empty, empty, node.ne, empty),
+            self._join(empty, node.sw, empty, empty),
+            self._join(node.se, empty, empty, empty),
+        )
+
+    def _centre(self, node):
+        return self._join(node.nw.se, node.ne.sw, node.sw.ne, node.se.nw)
+
+    # Evolution
+
+    def _life_4x4(self, node):
+        # Brute-force one generation of the centre 2x2 of a 4x4 node
+        cells = [[0] * 4 for _ in range(4)]
+        for qy, qx, quad in ((0, 0, node.nw), (0, 2, node.ne), (2, 0, node.sw), (2, 2, node.se)):
+            for y, x, leaf in ((0, 0, quad.nw), (0, 1, quad.ne), (1, 0, quad.sw), (1, 1, quad.se)):
+                cells[qy + y][qx + x] = leaf.population
+        result = []
+        for y in (1, 2):
+            for x in (1, 2):
+                total = sum(cells[y + i][x + j] for i in (-1, 0, 1) for j in (-1, 0, 1)) - cells[y][x]
+                result.append(_ON if total == 3 or (total == 2 and cells[y][x]) else _OFF)
+        return self._join(*result)
+
+    def _successor(self, node, j):
+        """Centre of ``node`` (one level down) after ``2**j`` generations, ``j <= level - 2``."""
+        if node.population == 0:
+            return node.nw
+        j = min(j, node.level - 2)
+        key = (node, j)
+        result = self._memo.get(key)
+        if result is not None:
+            return result
+        if node.level == 2:
+            result = self._life_4x4(node)
+        else:
+            nw, ne, sw, se = node.nw, node.ne, node.sw, node.se
+            join, step = self._join, self._successor
+            c1 = step(nw, j)
+            c2 = step(join(nw.ne, ne.nw, nw.se, ne.sw), j)
+            c3 = step(ne, j)
+            c4 = step(join(nw.sw, nw.se, sw.nw, sw.ne), j)
+            c5 = step(join(nw.se, ne.sw, sw.ne, se.nw), j)
+            c6 = step(join(ne.sw, ne.se, se.nw, se.ne), j)
+            c7 = step(sw, j)
+            c8 = step(join(sw.ne, se.nw, sw.se, se.sw), j)
+            c9 = step(se, j)
+            if j < node.level - 2:
+                # The nine sub-results are already 2**j generations ahead; just recentre
+                result = join(
+                    join(c1.se, c2.sw, c4.ne, c5.nw),
+                    join(c2.se, c3.sw, c5.ne, c6.nw),
+                    join(c4.se, c5.sw, c7.ne, c8.nw),
+                    join(c5.se, c6.sw, c8.ne, c9.nw),
+                )
+            else:
+                result = join(
+                    step(join(c1, c2, c4, c5), j),
+                    step(join(c2, c3, c5, c6), j),
+                    step(join(c4, c5, c7, c8), j),
+                    step(join(c5, c6, c8, c9), j),
+                )
+        self._memo[key] = result
+        if len(self._table) + len(self._memo) > self._limit:
+            self._memo = {}
+            if len(self._table) > self._limit:
+                self._table = {}
+        return result
+
+    def step_pow2(self, k):
+        """Advance the universe by ``2**k`` generations in one call."""
+        node, (y0, x0) = self._root, self._origin
+        # Grow until the pattern sits in the central quarter with room to spread 2**k cells
+        while node.level < k + 3 or self._centre(self._centre(node)).population != node.population:
+            shift = 1 << (node.level - 1)
+            node, y0, x0 = self._expand(node), y0 - shift, x0 - shift
+        quarter = 1 << (node.level - 2)
+        self._root, self._origin = self._successor(node, k), (y0 + quarter, x0 + quarter)
+        self.generation += 1 << k
+        if len(self._table) + len(self._memo) > self._limit:
+            self._collect()
+
+    def step(self, generations=1):
+        """Advance the universe by any number of generations."""
+        k = 0
+        while generations:
+            if generations & 1:
+                self.step_pow2(k)
+            generations >>= 1
+            k += 1
+
+    def _collect(self):
+        # Drop the memo and every node not reachable from the current universe
+        self._memo = {}
+        self._table = {}
+        seen = set()
+        stack = [self._root] + self._empty[1:]
+        while stack:
+            node = stack.pop()
+            if node.level == 0 or id(node) in seen:
+                continue
+            seen.add(id(node))
+            self._table[(node.nw, node.ne, node.sw, node.se)] = node
+            stack.extend((node.nw, node.ne, node.sw, node.se))
+        # Leave the reachable universe room to grow, or every later step would collect again
+        self._limit = max(self.max_nodes, 2 * len(self._table))
+
+    # Inspection
+
+    def cells(self):
+        """Return the live cells as an ``(n, 2)`` array of ``(y, x)``."""
+        found = []
+        stack = [(self._root, self._origin[0], self._origin[1])]
+        while stack:
+            node, y, x = stack.pop()
+            if node.population == 0:
+                continue
+            if node.level == 0:
+                found.append((y, x))
+                continue
+            half = 1 << (node.level - 1)
+            stack.extend(((node.nw, y, x), (node.ne, y, x + half),
+                          (node.sw, y + half, x), (node.se, y + half, x + half)))
+        found.sort()
+        # Coordinates can outgrow int64 in long runs; fall back to Python ints then
+        dtype = np.int64 if _fits_int64(found) else object
+        return np.array(found, dtype=dtype).reshape(-1, 2)
+
+    def to_grid(self, y0, x0, rows, cols):
+        """Return the ``rows x cols`` window starting at ``(y0, x0)`` as a uint8 grid."""
+        grid = np.zeros((rows, cols), dtype=np.uint8)
+        for y, x in self.cells().tolist():
+            if y0 <= y < y0 + rows and x0 <= x < x0 + cols:
+                grid[y - y0, x - x0] = 1
+        return grid
+
+
+def _fits_int64(cells):
+    limit = 1 << 62
+    return all(-limit < y < limit and -limit < x < limit for y, x in cells)
+
+
+class HashLifeStepper:
+    """Stepper (see ``simulation.buffered``) that keeps one Hashlife universe across steps.
+
+    The universe is unbounded and its memo survives between calls, so
+    ``step(n)`` jumps ``n`` generations at Hashlife speed. ``state`` is the
+    window of the universe covered by the initial grid; patterns that leave
+    it live on outside and may come back.
+    """
+
+    def __init__(self, name, state, params=None, seed=None, generation=0):
+        self.params = get_ruleset(name).params(params)
+        self.generation = generation
+        self.set_state(state)
+
+    def set_state(self, state):
+        self.shape, self.dtype = state.shape, state.dtype
+        self.universe = HashLife.from_grid(state, max_nodes=self.params['max_nodes'])
+
+    @property
+    def state(self):
+        """A copy of the window of the universe covered by the grid."""
+        return self.universe.to_grid(0, 0, *self.shape).astype(self.dtype, copy=False)
+
+    grid = state
+
+    def step(self, generations=1):
+        self.universe.step(generations)
+        self.generation += generations
+
+
+def hashlife_step(grid, params=None):
+    """Advance the live cells of ``grid`` ``params['generations']`` generations.
+
+    Within the call the universe is unbounded, but only the window covered
+    by ``grid`` is returned and the universe is then discarded. One
+    generation per call therefore equals ``life_step`` on a bounded board,
+    while a single call of ``n`` generations may differ from it, and every
+    call rebuilds the quadtree from scratch. Steppers use
+    ``HashLifeStepper`` instead, which keeps the universe and its memo.
+    """
+    params = params or {}
+    universe = HashLife.from_grid(grid, max_nodes=params.get('max_nodes', 1 << 20))
+    universe.step(params.get('generations', 1))
+    return universe.to_grid(0, 0, *grid.shape).astype(grid.dtype, copy=False)
+
+
+register_ruleset(Ruleset('life-hashlife', hashlife_step, 2, {'generations': 1, 'max_nodes': 1 << 20},
+                         stepper=HashLifeStepper,
+                         description="game.py's Life on an unbounded Hashlife universe seen through the grid"))
@@ -0,0 +1,91 @@
+"""Neighbourhood kernels shared by every ruleset.
+
+All kernels work on the last two axes of their input, so a stack of grids
+with shape ``(..., rows, cols)`` is handled in the same pass. Cells outside
+the board are treated as empty, which matches the bounds checks of the
+original per-cell loops.
+"""
+import numpy as np
+
+# Offsets of the eight Moore neighbours as (row, col)
+MOORE_OFFSETS = tuple((i, j) for i in (-1, 0, 1) for j in (-1, 0, 1) if (i, j) != (0, 0))
+
+
+def neighbor_sum(plane, dtype=None, out=None):
+    """Return the sum of the eight neighbours of every cell of ``plane``.
+
+    The result is accumulated in ``out`` when it is given (it must have the
+    shape of ``plane``), so the kernel allocates nothing.
+    """
+    if out is None:
+        out = np.zeros(plane.shape, dtype=plane.dtype if dtype is None else dtype)
+    else:
+        out[...] = 0
+    rows, cols = plane.shape[-2:]
+    for i, j in MOORE_OFFSETS:
+        # out[y, x] += plane[y + i, x + j] wherever the neighbour is on the board
+        target = out[..., max(-i, 0):rows - max(i, 0), max(-j, 0):cols - max(j, 0)]
+        source = plane[..., max(i, 0):rows + min(i, 0), max(j, 0):cols + min(j, 0)]
+        np.add(target, source, out=target, casting='unsafe')
+    return out
+
+
+def neighbor_histogram(grid, values, out=None, scratch=None):
+    """Count, for every cell, how many neighbours hold each of ``values``.
+
+    Returns a uint8 array of shape ``(len(values),) + grid.shape`` where
+    ``counts[k]`` is the number of neighbours equal to ``values[k]``. ``out``
+    and a boolean ``scratch`` array of the grid's shape may be passed to
+    avoid allocations.
+    """
+    if out is None:
+        out = np.empty((len(values),) + grid.shape, dtype=np.uint8)
+    if scratch is None:
+        scratch = np.empty(grid.shape, dtype=bool)
+    for counts, value in zip(out, values):
+        np.equal(grid, value, out=scratch)
+        neighbor_sum(scratch.view(np.uint8), out=counts)
+    return out
+
+
+def select_states(conditions, choices, out):
+    """``np.select`` with a default of 0, written into the state grid ``out``.
+
+    Choices are applied from the last condition to the first, so the first
+    true condition wins as in an if/elif chain; nothing is allocated.
+    """
+    out[...] = 0
+    for condition, choice in zip(conditions[::-1], choices[::-1]):
+        np.copyto(out, choice, where=condition, casting='unsafe')
+    return out
+
+
+class Workspace:
+    """Scratch arrays that are reused from one generation to the next.
+
+    ``array(name, shape, dtype)`` returns the same array on every call with
+    the same name, allocating it only on first use (or when the shape or
+    dtype changes), so a step that takes all its temporaries from a warm
+    workspace allocates nothing.
+    """
+
+    def __init__(self):
+        self._arrays = {}
+
+    def array(self, name, shape, dtype):
+        array = self._arrays.get(name)
+        if array is None or array.shape != shape or array.dtype != dtype:
+            array = self._arrays[name] = np.empty(shape, dtype=dtype)
+        return array
+
+    def histogram(self, grid, values):
+        """``neighbor_histogram`` of ``grid`` into workspace buffers."""
+        return neighbor_histogram(grid, values, out=self.array('counts', (len(values),) + grid.shape, np.uint8),
+                                  scratch=self.array('equal', grid.shape, bool))
+
+    def type_masks(self, grid, module_types):
+        """Return ``{module: grid == value}`` with every mask in a workspace buffer."""
+        masks = {}
+        for module, value in module_types.items():
+            masks[module] = np.equal(grid, value, out=self.array(f'is_{module}', grid.shape, bool))
+        return masks
@@ -0,0 +1,116 @@
+"""Multi-core stepping over shared-memory grids.
+
+The grid is split into horizontal bands. Every plane of the state lives
+twice in ``multiprocessing.shared_memory`` (front and back buffer), so the
+worker processes read the previous generation and write the next one in
+place; only band indices travel through the pool, never grid data. Each
+band is stepped together with a one-row halo above and below it, and the
+pool call returning for all bands is the barrier between generations.
+
+Workers look rulesets up by name, so custom rulesets must be registered at
+import time of a module the workers also import (or the pool must use the
+``fork`` start method, the default on Linux).
+"""
+import os
+from multiprocessing import get_context
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+from simulation.bands import band_streams, split_bands, step_band
+from simulation.kernels import Workspace
+from simulation.registry import get_ruleset
+
+# Per-worker state set up by _attach: ruleset, params, random streams, the two buffers of every plane and
+# a workspace per band
+_worker = {}
+
+
+def _attach(name, params, seed, layout):
+    ruleset = get_ruleset(name)
+    blocks, buffers = [], ([], [])
+    for shm_names, shape, dtype in layout:
+        for side, shm_name in enumerate(shm_names):
+            block = SharedMemory(name=shm_name)
+            blocks.append(block)
+            buffers[side].append(np.ndarray(shape, dtype=dtype, buffer=block.buf))
+    streams = band_streams(ruleset, params, seed)
+    _worker.update(ruleset=ruleset, params=params, streams=streams, blocks=blocks, buffers=buffers, work={})
+
+
+def _step_band(source, start, stop, generation):
+    buffers = _worker['buffers']
+    work = _worker['work'].setdefault(start, Workspace())
+    step_band(_worker['ruleset'], _worker['params'], buffers[source], buffers[1 - source], start, stop, work,
+              _worker['streams'], generation)
+
+
+class SharedMemoryExecutor:
+    """Step a ruleset on ``workers`` processes over shared-memory bands.
+
+    ``state`` is the grid (or tuple of planes) the ruleset expects. Stochastic
+    rulesets draw from counter-based streams seeded from ``seed`` (see
+    ``simulation.streams``), so a run matches a serial one of the same seed.
+    ``generation`` numbers ``state`` as in ``BufferedStepper``. Unlike
+    ``BufferedStepper``, an ``rng`` in ``params`` is refused with
+    ``ValueError`` (see ``simulation.bands.band_streams``).
+    Use it as a context manager, or call ``close()``, to stop the pool and
+    release the shared memory.
+    """
+
+    def __init__(self, name, state, params=None, workers=None, bands=None, seed=None, context=None, generation=0):
+        self.ruleset = get_ruleset(name)
+        # Refuse an explicit rng before any shared memory exists; each worker builds the streams itself
+        band_streams(self.ruleset, self.ruleset.params(params), seed)
+        planes = state if len(self.ruleset.planes) > 1 else (state,)
+        self.generation = generation
+        self._source = 0
+        self._blocks, self._buffers, layout = [], ([], []), []
+        for plane in planes:
+            plane = np.ascontiguousarray(plane)
+            names = []
+            for side in (0, 1):
+                block = SharedMemory(create=True, size=max(plane.nbytes, 1))
+                self._blocks.append(block)
+                names.append(block.name)
+                array = np.ndarray(plane.shape, dtype=plane.dtype, buffer=block.buf)
+                array[...] = plane
+                self._buffers[side].append(array)
+            layout.append((tuple(names), plane.shape, plane.dtype.str))
+
+        workers = workers or os.cpu_count()
+        # Fresh entropy when no seed is given, shared by every worker's streams
+        seed = np.random.SeedSequence(seed).entropy
+        self._pool = get_context(context).Pool(workers, initializer=_attach,
+                                               initargs=(name, self.ruleset.params(params), seed, layout))
+        self.bands = split_bands(planes[0].shape[0], bands or workers)
+
+    @property
+    def state(self):
+        """A copy of the current generation."""
+        planes = tuple(plane.copy() for plane in self._buffers[self._source])
+        return planes if len(planes) > 1 else planes[0]
+
+    def step(self, generations=1):
+        for _ in range(generations):
+            tasks = [(self._source, start, stop, self.generation) for start, stop in self.bands]
+            self._pool.starmap(_step_band, tasks)
+            self._source = 1 - self._source
+            self.generation += 1
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+            self._buffers = ([], [])
+            for block in self._blocks:
+                block.close()
+                block.unlink()
+            self._blocks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
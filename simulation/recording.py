@@ -0,0 +1,171 @@
+"""Compact recordings of every generation of a run, with seekable replay.
+
+A recording stores a full keyframe every ``keyframe_every`` generations and,
+for the generations in between, the XOR of each plane with the previous
+generation. Cells that did not change XOR to zero bytes, which zlib or lzma
+squeeze to almost nothing, so the file grows with the activity of the run
+rather than with generations times area.
+
+The file is laid out as::
+
+    magic      8 bytes   b'CITYREC1'
+    length     4 bytes   little-endian uint32, size of the header
+    header     JSON      ruleset, rows, cols, planes (name and dtype),
+                         keyframe_every and compression
+    records              one per generation: generation (uint64), kind
+                         (0 keyframe, 1 delta) and payload length (uint32),
+                         then the compressed bytes of every plane in order
+
+``Replay`` indexes the records on open and rebuilds any generation from the
+nearest keyframe at or before it.
+"""
+import json
+import lzma
+import struct
+import zlib
+
+import numpy as np
+
+MAGIC = b'CITYREC1'
+KEYFRAME, DELTA = 0, 1
+_LENGTH = struct.Struct('<I')
+_RECORD = struct.Struct('<QBI')
+_COMPRESSORS = {'zlib': zlib.compressobj, 'lzma': lzma.LZMACompressor}
+_DECOMPRESS = {'zlib': zlib.decompress, 'lzma': lzma.decompress}
+
+
+class Recorder:
+    """Record ``state`` and every generation passed to ``append`` to ``path``.
+
+    ``state`` is a grid, or a tuple with one array per name in ``planes``.
+    Use it as a context manager, or call ``close()``, to finish the file.
+    """
+
+    def __init__(self, path, ruleset, state, generation=0, keyframe_every=100, compression='zlib',
+                 planes=('state',)):
+        if compression not in _COMPRESSORS:
+            raise ValueError(f"unknown compression {compression!r}; available: {', '.join(_COMPRESSORS)}")
+        if keyframe_every < 1:
+            raise ValueError(f"keyframe_every must be at least 1, got {keyframe_every}")
+        arrays = tuple(np.ascontiguousarray(plane) for plane in (state if len(planes) > 1 else (state,)))
+        self.keyframe_every, self.compression = keyframe_every, compression
+        self.first_generation = self.generation = generation
+        self._previous = tuple(array.copy() for array in arrays)
+        self._delta = tuple(np.empty(array.nbytes, dtype=np.uint8) for array in arrays)
+
+        header = json.dumps({
+            'ruleset': ruleset, 'rows': arrays[0].shape[0], 'cols': arrays[0].shape[1],
+            'planes': [{'name': name, 'dtype': array.dtype.str} for name, array in zip(planes, arrays)],
+            'keyframe_every': keyframe_every, 'compression': compression,
+        }).encode()
+        self._file = open(path, 'wb')
+        self._file.write(MAGIC + _LENGTH.pack(len(header)) + header)
+        self._write(KEYFRAME, [array.reshape(-1).view(np.uint8) for array in arrays])
+
+    def append(self, state):
+        """Record ``state`` as the generation after the last one recorded."""
+        arrays = state if len(self._previous) > 1 else (state,)
+        self.generation += 1
+        if (self.generation - self.first_generation) % self.keyframe_every == 0:
+            self._write(KEYFRAME, [np.ascontiguousarray(array).reshape(-1).view(np.uint8) for array in arrays])
+        else:
+            for delta, previous, array in zip(self._delta, self._previous, arrays):
+                np.bitwise_xor(np.ascontiguousarray(array).reshape(-1).view(np.uint8),
+                               previous.reshape(-1).view(np.uint8), out=delta)
+            self._write(DELTA, self._delta)
+        for previous, array in zip(self._previous, arrays):
+            np.copyto(previous, array)
+
+    def _write(self, kind, chunks):
+        compressor = _COMPRESSORS[self.compression]()
+        payload = b''.join([compressor.compress(chunk) for chunk in chunks] + [compressor.flush()])
+        self._file.write(_RECORD.pack(self.generation, kind, len(payload)) + payload)
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class Replay:
+    """Random access to the generations of a recording."""
+
+    def __init__(self, path):
+        self._file = open(path, 'rb')
+        if self._file.read(len(MAGIC)) != MAGIC:
+            self._file.close()
+            raise ValueError(f"{path} is not a recording")
+        (length,) = _LENGTH.unpack(self._file.read(_LENGTH.size))
+        header = json.loads(self._file.read(length))
+        self.ruleset, self.planes = header['ruleset'], tuple(plane['name'] for plane in header['planes'])
+        self.keyframe_every, self._decompress = header['keyframe_every'], _DECOMPRESS[header['compression']]
+        shape = (header['rows'], header['cols'])
+        self._state = tuple(np.zeros(shape, dtype=np.dtype(plane['dtype'])) for plane in header['planes'])
+
+        # Index the records: generation, kind and payload offset and length
+        self._records = []
+        while True:
+            record = self._file.read(_RECORD.size)
+            if len(record) < _RECORD.size:
+                break
+            generation, kind, length = _RECORD.unpack(record)
+            self._records.append((generation, kind, self._file.tell(), length))
+            self._file.seek(length, 1)
+        if not self._records:
+            raise ValueError(f"{path} holds no generations")
+        self.first_generation = self._records[0][0]
+        self.last_generation = self._records[-1][0]
+        self._position = None           # index of the record self._state currently holds
+
+    def __len__(self):
+        return len(self._records)
+
+    def seek(self, generation):
+        """Return the state at ``generation`` (a grid, or a tuple of planes).
+
+        The arrays are reused by the next call; copy them to keep them.
+        Moving forward within a keyframe interval only decodes the deltas in
+        between.
+        """
+        target = generation - self.first_generation
+        if not 0 <= target < len(self._records):
+            raise IndexError(f"generation {generation} is not in {self.first_generation}..{self.last_generation}")
+        start = target
+        while self._records[start][1] != KEYFRAME:
+            start -= 1
+        if self._position is not None and start <= self._position <= target:
+            start = self._position + 1
+        for position in range(start, target + 1):
+            self._apply(self._records[position])
+        self._position = target
+        return self._state if len(self._state) > 1 else self._state[0]
+
+    def __iter__(self):
+        for generation in range(self.first_generation, self.last_generation + 1):
+            yield generation, self.seek(generation)
+
+    def _apply(self, record):
+        _, kind, offset, length = record
+        self._file.seek(offset)
+        data = np.frombuffer(self._decompress(self._file.read(length)), dtype=np.uint8)
+        for plane in self._state:
+            chunk, data = data[:plane.nbytes], data[plane.nbytes:]
+            target = plane.reshape(-1).view(np.uint8)
+            if kind == KEYFRAME:
+                target[...] = chunk
+            else:
+                target ^= chunk
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
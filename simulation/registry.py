@@ -0,0 +1,73 @@
+"""Registry of the available rulesets.
+
+A ruleset is a pure ``step(state, params) -> new_state`` function plus the
+metadata callers need to drive it. For single-plane rulesets the state is
+the ``(rows, cols)`` grid; rulesets with extra planes (city4's entropy) take
+and return a tuple with one array per entry of ``planes``.
+"""
+from dataclasses import dataclass, field
+from importlib import import_module
+
+# Modules whose import registers the built-in rulesets, loaded on first lookup
+_BUILTIN_MODULES = ('simulation.rules', 'simulation.bitlife', 'simulation.hashlife', 'simulation.sparse',
+                    'simulation.compiler')
+
+_RULESETS = {}
+_FACTORIES = {}
+_builtins_loaded = False
+
+
+@dataclass(frozen=True)
+class Ruleset:
+    name: str
+    step: object                        # step(state, params=None) -> new state
+    n_states: int                       # number of cell states, empty (0) included
+    defaults: dict = field(default_factory=dict)
+    planes: tuple = ('state',)
+    stochastic: bool = False
+    buffered: bool = False              # step also takes out= and work= and then allocates nothing
+    stepper: object = None              # class used instead of BufferedStepper, to keep state across steps
+    description: str = ''
+
+    def params(self, overrides=None):
+        """Return the default parameters updated with ``overrides``."""
+        return {**self.defaults, **(overrides or {})}
+
+
+def register_ruleset(ruleset):
+    """Add ``ruleset`` to the registry, replacing any ruleset of the same name."""
+    _RULESETS[ruleset.name] = ruleset
+    return ruleset
+
+
+def register_factory(name, factory):
+    """Register ``factory()``, called on the first lookup of ``name``, to build and register that ruleset.
+
+    Rulesets that are costly to set up (such as compiled lookup tables) are
+    then only built when used.
+    """
+    _FACTORIES[name] = factory
+
+
+def _load_builtins():
+    global _builtins_loaded
+    if not _builtins_loaded:
+        _builtins_loaded = True
+        for module in _BUILTIN_MODULES:
+            import_module(module)
+
+
+def get_ruleset(name):
+    """Look up a ruleset by name, raising ``KeyError`` with the known names."""
+    _load_builtins()
+    if name not in _RULESETS and name in _FACTORIES:
+        _FACTORIES[name]()
+    try:
+        return _RULESETS[name]
+    except KeyError:
+        raise KeyError(f"unknown ruleset {name!r}; available: {', '.join(ruleset_names())}") from None
+
+
+def ruleset_names():
+    _load_builtins()
+    return sorted(set(_RULESETS) | set(_FACTORIES))
@@ -0,0 +1,365 @@
+"""Rulesets of the pygame scripts as pure, pygame-free functions.
+
+Every function has the signature ``step(state, params=None)`` and returns
+the next generation without touching any global state. ``params`` overrides
+the defaults registered with the ruleset (``module_types`` and, for the
+entropy model, its entropy settings). The functions also accept ``out``
+(the buffer for the next generation, a tuple for city4) and ``work`` (a
+``Workspace`` of scratch arrays); given both, a step allocates nothing.
+"""
+import numpy as np
+
+from simulation.kernels import Workspace, neighbor_sum, select_states
+from simulation.registry import Ruleset, register_ruleset
+from simulation.storage import ENTROPY_DTYPE
+
+# Module types of city.py and city2.py
+CITY_MODULE_TYPES = {
+    'green': 1,
+    'living': 2,
+    'commerce': 3,
+    'health': 4
+}
+
+# Module types of city3.py and city4.py
+DISTRICT_MODULE_TYPES = {
+    'green': 1,       # Green spaces
+    'formal': 2,      # Formal structures
+    'informal': 3,    # Informal structures
+    'commerce': 4,    # Commercial areas
+    'health': 5       # Healthcare facilities
+}
+
+# Entropy values for each module type in city4.py
+ENTROPY_VALUES = {
+    'green': 30,
+    'formal': 10,
+    'informal': 70,
+    'commerce': 50,
+    'health': 40
+}
+DEFAULT_ENTROPY_VALUE = 30
+ENTROPY_FACTOR = 0.1
+
+CITY_PARAMS = {'module_types': CITY_MODULE_TYPES}
+DISTRICT_PARAMS = {'module_types': DISTRICT_MODULE_TYPES}
+ENTROPY_PARAMS = {
+    'module_types': DISTRICT_MODULE_TYPES,
+    'entropy_values': ENTROPY_VALUES,
+    'default_entropy_value': DEFAULT_ENTROPY_VALUE,
+    'entropy_factor': ENTROPY_FACTOR,
+    'rng': None,  # np.random.Generator (one per grid of a stack); if None, steppers use simulation.streams
+}
+
+
+# game.py: Conway's Game of Life (B3/S23)
+def life_step(grid, params=None, out=None, work=None):
+    out, work = _buffers(grid, out, work)
+    tmp = work.array('tmp', grid.shape, bool)
+    live_neighbors = neighbor_sum(grid, out=work.array('neighbors', grid.shape, np.uint8))  # Cells off the board count as dead
+    born = np.equal(grid, 0, out=work.array('born', grid.shape, bool))
+    born &= np.equal(live_neighbors, 3, out=tmp)
+    survives = _in_range(live_neighbors, 2, 3, work.array('survives', grid.shape, bool), tmp)
+    survives &= np.equal(grid, 1, out=tmp)
+    born |= survives
+    np.copyto(out, born, casting='unsafe')
+    return out
+
+
+# city.py: modified Game of Life with green, living, commerce and health modules
+def city_step(grid, params=None, out=None, work=None):
+    module_types = (params or {}).get('module_types', CITY_MODULE_TYPES)
+    out, work = _buffers(grid, out, work)
+    # Count the neighbors of every type for all cells in one pass
+    counts = work.histogram(grid, list(module_types.values()))
+    neighbors = dict(zip(module_types, counts))
+    total = counts.sum(axis=0, dtype=np.uint8, out=work.array('total', grid.shape, np.uint8))
+    is_type = work.type_masks(grid, module_types)
+    living = neighbors['living']
+    mask, tmp = _masks(work, grid.shape, 7), work.array('tmp', grid.shape, bool)
+
+    # Green stays if it has 2 or 3 neighbors of any type
+    _in_range(total, 2, 3, mask[0], tmp)
+    mask[0] &= is_type['green']
+    # Living stays if it has 2 or 3 living neighbors, otherwise becomes green
+    _in_range(living, 2, 3, mask[1], tmp)
+    mask[1] &= is_type['living']
+    # Commerce becomes or stays alive if it has at least one living neighbor
+    np.greater_equal(living, 1, out=mask[2])
+    mask[2] &= is_type['commerce']
+    # Health becomes or stays alive if there are at least two living neighbors
+    np.greater_equal(living, 2, out=mask[3])
+    mask[3] &= is_type['health']
+    # If the cell is dead, check for revival conditions
+    np.equal(living, 3, out=mask[4])
+    np.greater_equal(neighbors['commerce'], 1, out=mask[5])
+    mask[5] &= np.greater_equal(living, 1, out=tmp)
+    np.greater_equal(neighbors['health'], 1, out=mask[6])
+    mask[6] &= np.greater_equal(living, 2, out=tmp)
+
+    # Apply the rules based on the current cell's type and its neighbors (first matching condition wins)
+    return select_states([
+        mask[0], is_type['green'],
+        mask[1], is_type['living'],
+        mask[2], is_type['commerce'],
+        mask[3], is_type['health'],
+        mask[4], mask[5], mask[6],
+    ], [
+        module_types['green'], 0,
+        module_types['living'], module_types['green'],
+        module_types['commerce'], 0,
+        module_types['health'], 0,
+        module_types['living'],
+        module_types['commerce'],
+        module_types['health'],
+    ], out)
+
+
+# city2.py, apply_modified_rules(): green cells fully surrounded by non-green cells are resolved first
+def city2_green_step(grid, params=None, out=None, work=None):
+    module_types = (params or {}).get('module_types', CITY_MODULE_TYPES)
+    out, work = _buffers(grid, out, work)
+    # Count the neighbors of every type for all cells in one pass
+    counts = work.histogram(grid, list(module_types.values()))
+    neighbors = dict(zip(module_types, counts))
+    # Every neighbor on the board that is not green, empty cells included
+    ones = work.array('ones', grid.shape, np.uint8)
+    ones.fill(1)
+    non_green_count = neighbor_sum(ones, out=work.array('non_green', grid.shape, np.uint8))
+    non_green_count -= neighbors['green']
+
+    # Enforce the green cell rule, then apply the remaining rules (first matching condition wins)
+    surrounded = np.greater_equal(non_green_count, 8, out=work.array('surrounded', grid.shape, bool))
+    # Green becomes living if surrounded by living, otherwise stays green
+    to_living = _living_ahead(neighbors, work, grid.shape)
+    to_living &= surrounded
+    return select_states([
+        to_living,
+        surrounded,
+    ] + _city2_conditions(grid, module_types, counts, neighbors, work), [
+        module_types['living'],
+        module_types['green'],
+    ] + _city2_choices(module_types), out)
+
+
+# city2.py, apply_modified_rules2(): the ruleset the script runs
+def city2_step(grid, params=None, out=None, work=None):
+    module_types = (params or {}).get('module_types', CITY_MODULE_TYPES)
+    out, work = _buffers(grid, out, work)
+    # Count the neighbors of every type for all cells in one pass
+    counts = work.histogram(grid, list(module_types.values()))
+    neighbors = dict(zip(module_types, counts))
+
+    # Green becomes living if surrounded by living, otherwise stays green
+    is_green = np.equal(grid, module_types['green'], out=work.array('is_green_cell', grid.shape, bool))
+    to_living = _living_ahead(neighbors, work, grid.shape)
+    to_living &= is_green
+    return select_states([
+        to_living,
+        is_green,
+    ] + _city2_conditions(grid, module_types, counts, neighbors, work), [
+        module_types['living'],
+        module_types['green'],
+    ] + _city2_choices(module_types), out)
+
+
+# Cells with more living neighbors than commerce and health neighbors together
+def _living_ahead(neighbors, work, shape):
+    others = np.add(neighbors['commerce'], neighbors['health'], out=work.array('others', shape, np.uint8))
+    return np.greater(neighbors['living'], others, out=work.array('to_living', shape, bool))
+
+
+# Conditions shared by both city2 rulesets once the green rule has been handled
+def _city2_conditions(grid, module_types, counts, neighbors, work):
+    is_type = work.type_masks(grid, module_types)
+    total = counts.sum(axis=0, dtype=np.uint8, out=work.array('total', grid.shape, np.uint8))
+    mask = _masks(work, grid.shape, 6)
+    # Living becomes commerce if surrounded by more commerce, otherwise stays living
+    np.greater(neighbors['commerce'], neighbors['living'], out=mask[0])
+    mask[0] &= is_type['living']
+    # Commerce becomes health if surrounded by more health, otherwise stays commerce
+    np.greater(neighbors['health'], neighbors['commerce'], out=mask[1])
+    mask[1] &= is_type['commerce']
+    # Health becomes green if isolated, otherwise stays health
+    total -= neighbors['health']
+    np.less(total, 2, out=mask[2])
+    mask[2] &= is_type['health']
+    # Remaining cells become living if exactly 3 living neighbors, commerce with 1 living and 1 commerce, or health with 2 living and 1 health
+    tmp = work.array('tmp', grid.shape, bool)
+    np.equal(neighbors['living'], 3, out=mask[3])
+    np.equal(neighbors['living'], 1, out=mask[4])
+    mask[4] &= np.equal(neighbors['commerce'], 1, out=tmp)
+    np.equal(neighbors['living'], 2, out=mask[5])
+    mask[5] &= np.equal(neighbors['health'], 1, out=tmp)
+    return [
+        mask[0], is_type['living'],
+        mask[1], is_type['commerce'],
+        mask[2], is_type['health'],
+        mask[3], mask[4], mask[5],
+    ]
+
+
+def _city2_choices(module_types):
+    return [
+        module_types['commerce'], module_types['living'],
+        module_types['health'], module_types['commerce'],
+        module_types['green'], module_types['health'],
+        module_types['living'], module_types['commerce'], module_types['health'],
+    ]
+
+
+# city3.py: formal and informal development around green space, commerce and health
+def city3_step(grid, params=None, out=None, work=None):
+    module_types = (params or {}).get('module_types', DISTRICT_MODULE_TYPES)
+    out, work = _buffers(grid, out, work)
+    # Count the neighbors of every type for all cells in one pass
+    counts = work.histogram(grid, list(module_types.values()))
+    neighbors = dict(zip(module_types, counts))
+    is_type = work.type_masks(grid, module_types)
+    informal_ahead = np.greater(neighbors['informal'], neighbors['formal'],
+                                out=work.array('informal_ahead', grid.shape, bool))
+    mask, tmp = _masks(work, grid.shape, 6), work.array('tmp', grid.shape, bool)
+
+    # Formal structures, reverting to green space if overcrowded
+    np.equal(neighbors['informal'], 0, out=mask[0])
+    mask[0] &= np.greater_equal(neighbors['green'], 2, out=tmp)
+    mask[0] &= is_type['formal']
+    # Informal structures become formal if surrounded by formal structures
+    np.equal(neighbors['formal'], 0, out=mask[1])
+    mask[1] |= np.greater_equal(neighbors['green'], 1, out=tmp)
+    mask[1] &= is_type['informal']
+    # Green spaces are overtaken by informal structures
+    np.logical_and(is_type['green'], informal_ahead, out=mask[2])
+    # Commerce and health stay if supported by formal structures, otherwise become informal
+    np.logical_or(is_type['commerce'], is_type['health'], out=mask[3])
+    np.greater(neighbors['formal'], neighbors['informal'], out=mask[4])
+    mask[4] &= mask[3]
+    # Empty cells develop into informal if isolated, or formal if supported
+    np.greater_equal(neighbors['formal'], 3, out=mask[5])
+
+    # First matching condition wins, as in an if/elif chain
+    return select_states([
+        mask[0], is_type['formal'],
+        mask[1], is_type['informal'],
+        mask[2], is_type['green'],
+        mask[4], mask[3],
+        informal_ahead,
+        mask[5],
+    ], [
+        module_types['formal'], module_types['green'],
+        module_types['informal'], module_types['formal'],
+        module_types['informal'], module_types['green'],
+        grid, module_types['informal'],
+        module_types['informal'],
+        module_types['formal'],
+    ], out)
+
+
+# Helper function to determine which cells should transition based on entropy.
+# Works on whole arrays: `draws` holds one uniform random number per cell.
+def should_transition(entropy, threshold, influence, draws, out=None, scratch=None):
+    # The probability of transition increases as the entropy difference increases
+    probability = np.subtract(entropy, threshold, out=scratch)
+    probability += influence
+    probability /= 2
+    return np.less(draws, probability, out=out)
+
+
+# city4.py: stochastic transitions driven by an entropy field; the state is (grid, entropy_grid)
+def city4_step(state, params=None, out=None, work=None):
+    grid, entropy_grid = state
+    params = {**ENTROPY_PARAMS, **(params or {})}
+    module_types, entropy_values = params['module_types'], params['entropy_values']
+    rng = params['rng']
+    new_grid, work = _buffers(grid, None if out is None else out[0], work)
+    new_entropy_grid = np.empty_like(entropy_grid) if out is None else out[1]
+    shape = grid.shape
+
+    # Calculate the influence of neighboring cells as the mean over the 8 neighbor slots
+    entropy_influence = neighbor_sum(entropy_grid, out=work.array('influence', shape, ENTROPY_DTYPE))
+    entropy_influence /= ENTROPY_DTYPE.type(8)
+
+    # Draw the random numbers for every cell's transition at once
+    draws = work.array('draws', shape, np.float64)
+    if rng is None:
+        draws[...] = np.random.random(shape)  # the legacy global RNG cannot fill a buffer
+    elif isinstance(rng, np.random.Generator):
+        rng.random(out=draws)
+    else:
+        # One generator per grid of a (members, rows, cols) ensemble stack
+        for generator, member_draws in zip(rng, draws):
+            generator.random(out=member_draws)
+    is_type = work.type_masks(grid, module_types)
+    negated_influence = np.negative(entropy_influence, out=work.array('negated_influence', shape, ENTROPY_DTYPE))
+
+    # Apply rules based on the current module type and its entropy; the types are exclusive, so the
+    # per-type decisions can be combined into one mask
+    transition = work.array('transition', shape, bool)
+    decision, scratch = work.array('decision', shape, bool), work.array('probability', shape, ENTROPY_DTYPE)
+    transition[...] = False
+    for module, entropy, influence in (
+        # Formal structures may degrade to informal based on entropy and influence
+        ('formal', entropy_grid, entropy_influence),
+        # Informal structures may upgrade to formal based on entropy and influence
+        ('informal', entropy_grid, negated_influence),
+        # Green spaces, commercial areas and healthcare facilities may degrade based on surrounding entropy
+        ('green', entropy_influence, 0),
+        ('commerce', entropy_influence, 0),
+        ('health', entropy_influence, 0),
+    ):
+        should_transition(entropy, entropy_values[module], influence, draws, decision, scratch)
+        decision &= is_type[module]
+        transition |= decision
+
+    # Informal structures become formal, everything else becomes informal; if no transition occurs, maintain current type
+    np.copyto(new_grid, grid)
+    upgrade = np.logical_and(transition, is_type['informal'], out=decision)
+    np.copyto(new_grid, module_types['formal'], where=upgrade, casting='unsafe')
+    transition ^= upgrade
+    np.copyto(new_grid, module_types['informal'], where=transition, casting='unsafe')
+
+    # Calculate the new entropy value of each cell based on the type of module placed
+    cell_entropy = work.array('cell_entropy', shape, ENTROPY_DTYPE)
+    cell_entropy.fill(params['default_entropy_value'])
+    for module, mask in is_type.items():
+        np.copyto(cell_entropy, entropy_values[module], where=mask, casting='unsafe')
+
+    # Adjust the entropy of neighboring cells with some factor of each cell's new entropy value
+    neighbor_sum(cell_entropy, out=new_entropy_grid)
+    new_entropy_grid *= ENTROPY_DTYPE.type(params['entropy_factor'])
+    new_entropy_grid += cell_entropy
+    # Ensure entropy stays between 0 and 1
+    np.clip(new_entropy_grid, 0, 1, out=new_entropy_grid)
+
+    return new_grid, new_entropy_grid
+
+
+# Result grid and workspace of a step, allocated when the caller passes none
+def _buffers(grid, out, work):
+    return np.empty_like(grid) if out is None else out, Workspace() if work is None else work
+
+
+# Boolean scratch masks of a rule, reused between generations
+def _masks(work, shape, count):
+    return work.array('masks', (count,) + shape, bool)
+
+
+# (low <= values) & (values <= high) into out
+def _in_range(values, low, high, out, scratch):
+    np.greater_equal(values, low, out=out)
+    out &= np.less_equal(values, high, out=scratch)
+    return out
+
+
+register_ruleset(Ruleset('life', life_step, 2, buffered=True, description="Conway's Game of Life (game.py)"))
+register_ruleset(Ruleset('city', city_step, len(CITY_MODULE_TYPES) + 1, CITY_PARAMS,
+                         buffered=True, description='Modified Game of Life (city.py)'))
+register_ruleset(Ruleset('city2', city2_step, len(CITY_MODULE_TYPES) + 1, CITY_PARAMS,
+                         buffered=True, description='apply_modified_rules2 (city2.py)'))
+register_ruleset(Ruleset('city2-green', city2_green_step, len(CITY_MODULE_TYPES) + 1, CITY_PARAMS,
+                         buffered=True, description='apply_modified_rules with the surrounded-green rule (city2.py)'))
+register_ruleset(Ruleset('city3', city3_step, len(DISTRICT_MODULE_TYPES) + 1, DISTRICT_PARAMS,
+                         buffered=True, description='Formal and informal development (city3.py)'))
+register_ruleset(Ruleset('city4', city4_step, len(DISTRICT_MODULE_TYPES) + 1, ENTROPY_PARAMS,
+                         planes=('state', 'entropy'), stochastic=True, buffered=True,
+                         description='Stochastic entropy model (city4.py)'))
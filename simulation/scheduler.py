@@ -0,0 +1,100 @@
+"""Run the simulation at its own rate, independent of the display.
+
+``StepScheduler`` calls a step function on a background thread at a target
+number of generations per second. The display loop keeps its own frame
+rate: when rendering is the bottleneck several generations pass between
+two frames, and when stepping is the bottleneck frames without a new
+generation can be skipped (``version`` has not moved). NumPy releases the
+GIL while it steps, so the event loop stays responsive either way.
+
+The display loop reads and edits the state inside ``with scheduler:``,
+which holds the stepping thread off for the duration of the block. Input is
+polled before entering it, so a generation still in progress never delays
+the event queue; the block only applies what was polled::
+
+    events = pygame.event.get()
+    with scheduler:
+        handle(events)           # edits call scheduler.touch()
+        if scheduler.version != drawn:
+            draw()
+"""
+import threading
+import time
+
+
+class StepScheduler:
+    """Call ``step()`` ``rate`` times per second on a background thread while not paused."""
+
+    def __init__(self, step, rate, paused=True):
+        self.step = step
+        self.rate = rate
+        self.generation = 0
+        self.version = 0                 # bumped by every generation and every touch()
+        self._paused = paused
+        self._closed = False
+        self._lock = threading.Lock()
+        self._frame = threading.Condition()
+        self._frames_waiting = 0
+        self._wake = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='simulation-scheduler', daemon=True)
+        self._thread.start()
+
+    @property
+    def paused(self):
+        return self._paused
+
+    @paused.setter
+    def paused(self, paused):
+        self._paused = paused
+        self._wake.set()
+
+    def touch(self):
+        """Record an edit of the state so the next frame redraws it; call inside ``with scheduler:``."""
+        self.version += 1
+
+    def __enter__(self):
+        # Announce the frame first so the stepping thread lets it in between two generations
+        with self._frame:
+            self._frames_waiting += 1
+        self._lock.acquire()
+        with self._frame:
+            self._frames_waiting -= 1
+        return self
+
+    def __exit__(self, *exc_info):
+        self._lock.release()
+        with self._frame:
+            self._frame.notify_all()
+
+    def close(self):
+        """Stop the stepping thread and wait for the generation in progress to finish."""
+        self._closed = True
+        self._wake.set()
+        self._thread.join()
+
+    def _run(self):
+        due = None
+        while not self._closed:
+            if self._paused:
+                due = None
+                self._wake.wait()
+                self._wake.clear()
+                continue
+            now = time.perf_counter()
+            if due is None:
+                due = now
+            elif now < due:
+                self._wake.wait(due - now)
+                self._wake.clear()
+                continue
+
+            with self._frame:
+                self._frame.wait_for(lambda: not self._frames_waiting)
+            with self._lock:
+                self.step()
+                self.generation += 1
+                self.version += 1
+            # When stepping is too slow for the target, run flat out instead of
+            # piling up a backlog of generations to catch up on
+            interval = 1 / self.rate
+            due = max(due + interval, time.perf_counter() - interval)
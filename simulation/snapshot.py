@@ -0,0 +1,119 @@
+"""Binary snapshots of a simulation state, loaded with ``np.memmap``.
+
+A snapshot file is laid out as::
+
+    magic      8 bytes   b'CITYSNAP'
+    length     4 bytes   little-endian uint32, size of the header
+    header     JSON      ruleset, rows, cols, generation and, per plane,
+                         its name, dtype and byte offset from the first plane
+    planes               each plane as raw C-order data; the first starts at
+                         the 64-byte boundary after the header, and every
+                         plane is 64-byte aligned
+
+The planes are mapped straight from the file on load, so even multi-GB maps
+open instantly and only the pages that are touched are ever read.
+"""
+import json
+import struct
+from dataclasses import dataclass
+
+import numpy as np
+
+MAGIC = b'CITYSNAP'
+_LENGTH = struct.Struct('<I')
+_ALIGN = 64
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    ruleset: str
+    generation: int
+    planes: dict                        # plane name -> (rows, cols) array, memory-mapped on load
+
+    @property
+    def state(self):
+        """The planes in the form ``Ruleset.step`` takes: the grid, or a tuple of planes."""
+        planes = tuple(self.planes.values())
+        return planes if len(planes) > 1 else planes[0]
+
+
+def _aligned(offset):
+    return -(-offset // _ALIGN) * _ALIGN
+
+
+def save_snapshot(path, ruleset, state, generation=0, planes=('state',)):
+    """Write ``state`` (a grid, or a tuple with one array per name in ``planes``) to ``path``."""
+    arrays = [np.ascontiguousarray(plane) for plane in (state if len(planes) > 1 else (state,))]
+    if len(arrays) != len(planes):
+        raise ValueError(f"expected {len(planes)} planes ({', '.join(planes)}), got {len(arrays)}")
+    shape = arrays[0].shape
+    if any(array.shape != shape or array.ndim != 2 for array in arrays):
+        raise ValueError("every plane must be 2-D with the same shape")
+
+    entries, offset = [], 0
+    for name, array in zip(planes, arrays):
+        entries.append({'name': name, 'dtype': array.dtype.str, 'offset': offset})
+        offset = _aligned(offset + array.nbytes)
+    header = json.dumps({'ruleset': ruleset, 'rows': shape[0], 'cols': shape[1],
+                         'generation': int(generation), 'planes': entries}).encode()
+
+    with open(path, 'wb') as file:
+        file.write(MAGIC + _LENGTH.pack(len(header)) + header)
+        start = _data_start(len(header))
+        for entry, array in zip(entries, arrays):
+            file.write(b'\0' * (start + entry['offset'] - file.tell()))
+            array.tofile(file)
+
+
+def _data_start(header_length):
+    return _aligned(len(MAGIC) + _LENGTH.size + header_length)
+
+
+def read_header(path):
+    """Return the decoded header of the snapshot at ``path`` without touching the planes."""
+    with open(path, 'rb') as file:
+        magic = file.read(len(MAGIC))
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a snapshot file")
+        (length,) = _LENGTH.unpack(file.read(_LENGTH.size))
+        header = json.loads(file.read(length))
+    header['data_start'] = _data_start(length)
+    return header
+
+
+def load_snapshot(path, mode='r'):
+    """Map the snapshot at ``path``.
+
+    ``mode`` is passed to ``np.memmap``: ``'r'`` for read-only, ``'c'`` for
+    copy-on-write (edits stay in memory) or ``'r+'`` to edit the file.
+    """
+    header = read_header(path)
+    shape = (header['rows'], header['cols'])
+    planes = {entry['name']: np.memmap(path, dtype=np.dtype(entry['dtype']), mode=mode,
+                                       offset=header['data_start'] + entry['offset'], shape=shape)
+              for entry in header['planes']}
+    return Snapshot(header['ruleset'], header['generation'], planes)
+
+
+def restore_snapshot(path, ruleset, state):
+    """Copy the snapshot at ``path`` into the arrays of ``state`` in place and return its generation.
+
+    ``state`` is a grid or a tuple of planes, as for ``save_snapshot``.
+    Raises ``ValueError`` if the snapshot belongs to another ruleset or its
+    planes do not match ``state``.
+    """
+    snapshot = load_snapshot(path)
+    if snapshot.ruleset != ruleset:
+        raise ValueError(f"{path} holds a {snapshot.ruleset!r} snapshot, not {ruleset!r}")
+    targets = state if isinstance(state, tuple) else (state,)
+    planes = tuple(snapshot.planes.values())
+    if len(planes) != len(targets) or any(plane.shape != target.shape for plane, target in zip(planes, targets)):
+        raise ValueError(f"{path} does not match the current grid")
+    for target, plane in zip(targets, planes):
+        np.copyto(target, plane, casting='same_kind')
+    return snapshot.generation
+
+
+def is_snapshot(path):
+    with open(path, 'rb') as file:
+        return file.read(len(MAGIC)) == MAGIC
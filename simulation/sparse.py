@@ -0,0 +1,153 @@
+"""Sparse Game of Life for huge, mostly empty universes.
+
+Live cells are kept as an ``(n, 2)`` int64 array of ``(y, x)`` coordinates.
+A generation counts neighbour coordinates with ``np.unique``, so the work
+and memory are proportional to the population instead of the board area.
+With a ``shape`` the universe is the fixed board of game.py (cells beyond
+the edge are dead); without one it is unbounded.
+
+``AdaptiveLife`` switches between this representation and a dense grid as
+the density of the pattern changes.
+"""
+import numpy as np
+
+from simulation.kernels import MOORE_OFFSETS
+from simulation.registry import Ruleset, register_ruleset
+from simulation.rules import life_step
+
+_OFFSETS = np.array(MOORE_OFFSETS, dtype=np.int64)
+
+
+def sparse_life_step(cells, shape=None):
+    """Advance the live ``cells`` one generation and return the new live cells, sorted."""
+    cells = np.asarray(cells, dtype=np.int64).reshape(-1, 2)
+    if len(cells) == 0:
+        return cells
+    neighbours = (cells[:, np.newaxis, :] + _OFFSETS).reshape(-1, 2)
+    if shape is not None:
+        inside = ((neighbours >= 0) & (neighbours < shape)).all(axis=1)
+        neighbours = neighbours[inside]
+        if len(neighbours) == 0:
+            return np.empty((0, 2), dtype=np.int64)
+
+    # Encode coordinates as single int64 keys relative to the bounding box
+    low = neighbours.min(axis=0)
+    width = neighbours[:, 1].max() - low[1] + 1
+    keys, counts = np.unique((neighbours[:, 0] - low[0]) * width + (neighbours[:, 1] - low[1]),
+                             return_counts=True)
+    live = np.sort((cells[:, 0] - low[0]) * width + (cells[:, 1] - low[1]))
+    position = np.minimum(np.searchsorted(live, keys), len(live) - 1)
+    alive = live[position] == keys
+
+    born = keys[(counts == 3) | ((counts == 2) & alive)]
+    return np.stack([born // width + low[0], born % width + low[1]], axis=1)
+
+
+def cells_to_grid(cells, shape, origin=(0, 0)):
+    grid = np.zeros(shape, dtype=np.uint8)
+    if len(cells):
+        grid[cells[:, 0] - origin[0], cells[:, 1] - origin[1]] = 1
+    return grid
+
+
+def grid_to_cells(grid, origin=(0, 0)):
+    ys, xs = np.nonzero(grid)
+    return np.stack([ys + origin[0], xs + origin[1]], axis=1).astype(np.int64)
+
+
+class AdaptiveLife:
+    """Life that keeps sparse patterns as coordinates and dense ones as a grid.
+
+    The pattern is stored sparsely while its density (population over the
+    board area, or over its bounding box when unbounded) is below
+    ``sparse_below`` and densely once it rises above ``dense_above``; the gap
+    between the two avoids flipping back and forth every generation.
+    """
+
+    def __init__(self, cells, shape=None, sparse_below=0.02, dense_above=0.05):
+        self.shape, self.sparse_below, self.dense_above = shape, sparse_below, dense_above
+        self.generation = 0
+        self._cells = np.asarray(cells, dtype=np.int64).reshape(-1, 2)
+        self._grid = self._origin = None
+        self._rebalance()
+
+    @classmethod
+    def from_grid(cls, grid, bounded=True, **kwargs):
+        return cls(grid_to_cells(grid), grid.shape if bounded else None, **kwargs)
+
+    @property
+    def is_sparse(self):
+        return self._grid is None
+
+    @property
+    def population(self):
+        return len(self._cells) if self.is_sparse else int(np.count_nonzero(self._grid))
+
+    def cells(self):
+        """Return the live cells as a sorted ``(n, 2)`` int64 array of ``(y, x)``."""
+        if self.is_sparse:
+            return self._cells
+        return grid_to_cells(self._grid, self._origin)
+
+    def to_grid(self, shape=None, origin=(0, 0)):
+        """Return the window of ``shape`` (the board by default) at ``origin`` as a uint8 grid."""
+        shape = self.shape if shape is None else shape
+        cells = self.cells()
+        inside = ((cells >= origin) & (cells < np.add(origin, shape))).all(axis=1)
+        return cells_to_grid(cells[inside], shape, origin)
+
+    def step(self):
+        if self.is_sparse:
+            self._cells = sparse_life_step(self._cells, self.shape)
+        elif self.shape is not None:
+            self._grid = life_step(self._grid)
+        else:
+            # Unbounded: grow the window by the one cell the pattern can spread
+            padded = np.pad(self._grid, 1)
+            self._grid, self._origin = life_step(padded), (self._origin[0] - 1, self._origin[1] - 1)
+        self.generation += 1
+        self._rebalance()
+
+    def _density(self, population, cells=None):
+        if self.shape is not None:
+            area = self.shape[0] * self.shape[1]
+        elif cells is not None:
+            area = int(np.prod(cells.max(axis=0) - cells.min(axis=0) + 1)) if len(cells) else 1
+        else:
+            area = self._grid.size
+        return population / area
+
+    def _rebalance(self):
+        if self.is_sparse:
+            if self._density(len(self._cells), self._cells) > self.dense_above:
+                if self.shape is not None:
+                    self._grid, self._origin = cells_to_grid(self._cells, self.shape), (0, 0)
+                else:
+                    low = self._cells.min(axis=0)
+                    shape = tuple(self._cells.max(axis=0) - low + 1)
+                    self._grid, self._origin = cells_to_grid(self._cells, shape, tuple(low)), tuple(low)
+                self._cells = None
+        else:
+            cells = grid_to_cells(self._grid, self._origin) if self.shape is None else None
+            population = len(cells) if cells is not None else int(np.count_nonzero(self._grid))
+            if self._density(population, cells) < self.sparse_below:
+                self._cells = grid_to_cells(self._grid, self._origin)
+                self._grid = self._origin = None
+            elif cells is not None and len(cells):
+                # Trim the unbounded window back to the pattern's bounding box
+                low = cells.min(axis=0)
+                high = cells.max(axis=0) + 1
+                top, left = low - self._origin
+                bottom, right = high - self._origin
+                self._grid = self._grid[top:bottom, left:right]
+                self._origin = tuple(low)
+
+
+def sparse_step(grid, params=None):
+    """Dense ``step`` wrapper: one generation of the live cells of ``grid`` on its fixed board."""
+    cells = sparse_life_step(grid_to_cells(grid), grid.shape)
+    return cells_to_grid(cells, grid.shape).astype(grid.dtype, copy=False)
+
+
+register_ruleset(Ruleset('life-sparse', sparse_step, 2,
+                         description="game.py's Life computed from live-cell coordinates"))
@@ -0,0 +1,207 @@
+"""Rulesets declared in JSON or TOML files instead of Python branches.
+
+A spec names the module types and lists the transitions as an ordered
+list of rules; the first rule whose conditions all hold decides a cell's
+next state::
+
+    {
+      "name": "city3-spec",
+      "module_types": {"green": 1, "formal": 2, "informal": 3, "commerce": 4, "health": 5},
+      "default": "empty",
+      "rules": [
+        {"state": "formal", "counts": {"informal": 0, "green": [2, 8]}, "then": "formal"},
+        {"state": "green", "compare": [["informal", ">", "formal"]], "then": "informal"},
+        {"state": ["commerce", "health"], "then": "keep"}
+      ]
+    }
+
+Rule keys:
+
+``state``
+    A module type, ``"empty"``, or a list of them; omitted, any state matches.
+``counts``
+    Number of neighbours per module type (or ``"total"`` for all of them):
+    an exact count or an inclusive ``[low, high]`` range.
+``compare``
+    ``[left, operator, right]`` triples with an operator among
+    ``< <= == != >= >``; each side is a module type, a list of module
+    types (their counts added), ``"total"`` or a number.
+``then``
+    The next state: a module type, ``"empty"`` or ``"keep"``.
+
+``default`` (``"empty"`` or ``"keep"``) applies when no rule matches.
+
+A spec describes transitions only: colors stay with the scripts that draw
+the grid. Rules that depend on more than a cell's state and its neighbour
+counts, such as city4's entropy-driven transitions, cannot be expressed.
+
+Specs are validated when they are loaded, and ``ValueError`` names the
+offending entry. ``load_ruleset`` then compiles the rules into a lookup
+table (see ``simulation.compiler``) and registers the result, so a spec
+runs as fast as the compiled built-in rulesets.
+"""
+import json
+
+import numpy as np
+
+from simulation.compiler import MAX_COUNTED_STATES, compile_ruleset
+from simulation.kernels import neighbor_histogram, select_states
+from simulation.registry import Ruleset, ruleset_names
+
+KEEP = 'keep'
+_OPERATORS = {'<': np.less, '<=': np.less_equal, '==': np.equal, '!=': np.not_equal,
+              '>=': np.greater_equal, '>': np.greater}
+_SPEC_KEYS = {'name', 'description', 'module_types', 'default', 'rules'}
+_RULE_KEYS = {'state', 'counts', 'compare', 'then'}
+
+
+def read_spec(path):
+    """Read and validate the spec at ``path`` (``.json`` or ``.toml``)."""
+    if str(path).endswith('.toml'):
+        import tomllib
+        with open(path, 'rb') as file:
+            raw = tomllib.load(file)
+    else:
+        with open(path) as file:
+            raw = json.load(file)
+    return parse_spec(raw)
+
+
+def parse_spec(raw):
+    """Validate a spec given as a dict and return it in normalized form.
+
+    States and module types are resolved to their integer values, count
+    operands to tuples of values, and ``then`` to a value or ``KEEP``.
+    """
+    _check_keys(raw, _SPEC_KEYS, 'spec')
+    for key in ('name', 'module_types', 'rules'):
+        if key not in raw:
+            raise ValueError(f"spec: missing {key!r}")
+    module_types = raw['module_types']
+    if not isinstance(module_types, dict) or not module_types:
+        raise ValueError("spec.module_types: expected a non-empty table of name -> value")
+    if len(module_types) > MAX_COUNTED_STATES:
+        raise ValueError(f"spec.module_types: {len(module_types)} module types; "
+                         f"at most {MAX_COUNTED_STATES} can be compiled to a lookup table")
+    if sorted(module_types.values()) != list(range(1, len(module_types) + 1)):
+        raise ValueError(f"spec.module_types: values must be 1..{len(module_types)}, each used once")
+
+    spec = {
+        'name': raw['name'],
+        'description': raw.get('description', f"rules from spec {raw['name']!r}"),
+        'module_types': dict(module_types),
+        'n_states': len(module_types) + 1,
+        'default': _choice(raw.get('default', 'empty'), {}, 'spec.default'),
+    }
+    if not isinstance(raw['rules'], list) or not raw['rules']:
+        raise ValueError("spec.rules: expected a non-empty list")
+    spec['rules'] = [_rule(rule, module_types, f'spec.rules[{index}]') for index, rule in enumerate(raw['rules'])]
+    return spec
+
+
+def _check_keys(table, allowed, where):
+    if not isinstance(table, dict):
+        raise ValueError(f"{where}: expected a table")
+    unknown = set(table) - allowed
+    if unknown:
+        raise ValueError(f"{where}: unknown keys {', '.join(sorted(unknown))}")
+
+
+def _state(name, module_types, where):
+    if not isinstance(name, str):
+        raise ValueError(f"{where}: expected a state name, got {name!r}")
+    if name == 'empty':
+        return 0
+    if name not in module_types:
+        raise ValueError(f"{where}: unknown state {name!r}")
+    return module_types[name]
+
+
+def _choice(name, module_types, where):
+    return KEEP if name == KEEP else _state(name, module_types, where)
+
+
+def _operand(operand, module_types, where):
+    # A number, or the tuple of state values whose neighbour counts are added
+    if isinstance(operand, int) and not isinstance(operand, bool):
+        return operand
+    if operand == 'total':
+        return tuple(module_types.values())
+    names = operand if isinstance(operand, list) else [operand]
+    if not names or not all(isinstance(name, str) and name in module_types for name in names):
+        raise ValueError(f"{where}: expected a module type, a list of them, 'total' or a number")
+    return tuple(module_types[name] for name in names)
+
+
+def _rule(rule, module_types, where):
+    _check_keys(rule, _RULE_KEYS, where)
+    if 'then' not in rule:
+        raise ValueError(f"{where}: missing 'then'")
+    states = rule.get('state')
+    if states is not None:
+        names = states if isinstance(states, list) else [states]
+        states = tuple(_state(name, module_types, f'{where}.state') for name in names)
+
+    counts = []
+    _check_keys(rule.get('counts', {}), set(module_types) | {'total'}, f'{where}.counts')
+    for name, bounds in rule.get('counts', {}).items():
+        if isinstance(bounds, int):
+            bounds = [bounds, bounds]
+        # bool is an int subclass, so JSON true/false must be turned away by name
+        if not (isinstance(bounds, list) and len(bounds) == 2
+                and all(isinstance(b, int) and not isinstance(b, bool) for b in bounds)
+                and 0 <= bounds[0] <= bounds[1] <= 8):
+            raise ValueError(f"{where}.counts.{name}: expected a count or a [low, high] range within 0..8")
+        counts.append((_operand(name, module_types, f'{where}.counts'), bounds[0], bounds[1]))
+
+    compare = []
+    for index, triple in enumerate(rule.get('compare', [])):
+        place = f'{where}.compare[{index}]'
+        if not isinstance(triple, list) or len(triple) != 3 or triple[1] not in _OPERATORS:
+            raise ValueError(f"{place}: expected [left, operator, right] with one of {' '.join(_OPERATORS)}")
+        compare.append((_operand(triple[0], module_types, place), triple[1], _operand(triple[2], module_types, place)))
+
+    return {'states': states, 'counts': counts, 'compare': compare,
+            'then': _choice(rule['then'], module_types, f'{where}.then')}
+
+
+def spec_step(grid, params):
+    """Step ``grid`` by evaluating the rules of the parsed spec in ``params['spec']``."""
+    spec = params['spec']
+    counts = neighbor_histogram(grid, list(range(1, spec['n_states'])))
+
+    def count(operand):
+        if isinstance(operand, int):
+            return operand
+        return counts[[value - 1 for value in operand]].sum(axis=0, dtype=np.uint8)
+
+    conditions, choices = [], []
+    for rule in spec['rules']:
+        mask = np.ones(grid.shape, dtype=bool)
+        if rule['states'] is not None:
+            mask &= np.isin(grid, rule['states'])
+        for operand, low, high in rule['counts']:
+            total = count(operand)
+            mask &= (total >= low) & (total <= high)
+        for left, operator, right in rule['compare']:
+            mask &= _OPERATORS[operator](count(left), count(right))
+        conditions.append(mask)
+        choices.append(grid if rule['then'] == KEEP else rule['then'])
+    if spec['default'] == KEEP:
+        conditions.append(np.ones(grid.shape, dtype=bool))
+        choices.append(grid)
+    return select_states(conditions, choices, np.empty_like(grid))
+
+
+def load_ruleset(path, replace=False):
+    """Read the spec at ``path``, compile it to a lookup table and register it under its name.
+
+    Raises ``ValueError`` if a ruleset of that name is already registered,
+    unless ``replace`` is set.
+    """
+    spec = read_spec(path)
+    if not replace and spec['name'] in ruleset_names():
+        raise ValueError(f"{path}: ruleset {spec['name']!r} is already registered")
+    interpreted = Ruleset(spec['name'], spec_step, spec['n_states'], {'spec': spec},
+                          description=spec['description'])
+    return compile_ruleset(interpreted, compiled_name=spec['name'])
@@ -0,0 +1,195 @@
+"""Sweep ruleset parameters over a grid of values on a process pool.
+
+Every combination of the ``--param`` values (and of ``--seeds`` seeds) is
+one headless run (see ``headless.run``) from its own random grid. Finished
+runs are cached in ``--cache`` as one JSON file per run, named by a hash of
+everything that determines the result, so rerunning a sweep only computes
+the combinations that are new (clear the cache after changing the rules
+themselves). The summary is written as a columnar ``.npz`` file with one
+array per parameter and per metric. Example::
+
+    python sweep.py --param default_entropy_value=10,30,50 --param entropy_factor=0.05,0.1,0.2 \
+        --param entropy_values.informal=50,70,90 --steps 200 --size 128x128 --seeds 4 \
+        --workers 4 --cache runs/sweep-cache --output runs/sweep.npz
+
+Parameter names are keys of the ruleset's numeric defaults; ``name.key``
+sets one numeric entry of a table such as ``entropy_values``.
+"""
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import time
+from multiprocessing import get_context
+
+import numpy as np
+
+from headless import initial_state, parse_size, random_grid, run
+from simulation import get_ruleset, ruleset_names
+
+
+def parse_param(text):
+    """Parse ``name=v1,v2,...`` into ``(name, [v1, v2, ...])``."""
+    name, sep, values = text.partition('=')
+    if not sep or not values:
+        raise argparse.ArgumentTypeError(f'expected NAME=V1,V2,..., got {text!r}')
+    try:
+        return name, [json.loads(value) for value in values.split(',')]
+    except json.JSONDecodeError:
+        raise argparse.ArgumentTypeError(f'{text!r}: values must be numbers') from None
+
+
+# Defaults that lay out the states of a ruleset rather than tune its rules
+_STRUCTURAL = {'module_types', 'n_states'}
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def apply_overrides(defaults, point):
+    """Return the parameters ``defaults`` with the (possibly dotted) names of ``point`` replaced.
+
+    Only numbers can be swept: a name must be a numeric default, or
+    ``table.entry`` for a numeric entry of a dict default. Raises
+    ``ValueError`` for any other name, and for values that are not numbers.
+    """
+    params = dict(defaults)
+    for name, value in point.items():
+        key, _, entry = name.partition('.')
+        if key not in params:
+            raise ValueError(f'unknown parameter {name!r}')
+        if entry and not isinstance(params[key], dict):
+            raise ValueError(f'{name!r}: {key!r} is not a table')
+        if entry and entry not in params[key]:
+            raise ValueError(f'unknown parameter {name!r}')
+        current = params[key][entry] if entry else params[key]
+        if key in _STRUCTURAL or not _is_number(current):
+            raise ValueError(f'{name!r} is not a numeric parameter')
+        if not _is_number(value):
+            raise ValueError(f'{name!r}: {value!r} is not a number')
+        if entry:
+            params[key] = {**params[key], entry: value}
+        else:
+            params[key] = value
+    return params
+
+
+def run_key(task):
+    """Hash of everything that determines the result of a run."""
+    return hashlib.blake2b(json.dumps(task, sort_keys=True).encode(), digest_size=16).hexdigest()
+
+
+def run_point(task):
+    """Run one combination of the sweep and return its metrics.
+
+    The metrics are the fraction of cells in every state, the fraction that
+    differs from the initial grid, and the mean of every extra plane, all at
+    the last generation.
+    """
+    ruleset = get_ruleset(task['ruleset'])
+    grid = random_grid(tuple(task['size']), ruleset.n_states, task['density'], np.random.default_rng(task['seed']))
+    params = apply_overrides(ruleset.defaults, task['params'])
+    start = time.perf_counter()
+    state = run(task['ruleset'], initial_state(ruleset, grid), task['steps'], params, seed=task['seed'])
+    elapsed = time.perf_counter() - start
+
+    planes = state if len(ruleset.planes) > 1 else (state,)
+    counts = np.bincount(planes[0].ravel(), minlength=ruleset.n_states) / grid.size
+    metrics = {f'fraction_state_{value}': float(count) for value, count in enumerate(counts)}
+    metrics['fraction_changed'] = float(np.count_nonzero(planes[0] != grid) / grid.size)
+    for name, plane in zip(ruleset.planes[1:], planes[1:]):
+        metrics[f'mean_{name}'] = float(plane.mean(dtype=np.float64))
+    metrics['seconds'] = elapsed
+    return metrics
+
+
+def _run_and_cache(item):
+    # Pool entry point: compute one run and store it in the cache before reporting it
+    index, task, path = item
+    metrics = run_point(task)
+    if path:
+        # Write to a temporary file first so an interrupted sweep never leaves a truncated entry
+        with open(path + '.tmp', 'w') as file:
+            json.dump({'task': task, 'metrics': metrics}, file)
+        os.replace(path + '.tmp', path)
+    return index, metrics
+
+
+def sweep(tasks, cache_dir=None, workers=None):
+    """Return the metrics of every task, reading cached runs and computing the rest on ``workers`` processes."""
+    results = [None] * len(tasks)
+    pending = []
+    for index, task in enumerate(tasks):
+        path = os.path.join(cache_dir, run_key(task) + '.json') if cache_dir else None
+        if path and os.path.exists(path):
+            with open(path) as file:
+                results[index] = json.load(file)['metrics']
+        else:
+            pending.append((index, task, path))
+
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+    if workers == 1 or len(pending) <= 1:
+        for index, metrics in map(_run_and_cache, pending):
+            results[index] = metrics
+    else:
+        with get_context().Pool(workers) as pool:
+            for index, metrics in pool.imap_unordered(_run_and_cache, pending):
+                results[index] = metrics
+    return results, len(tasks) - len(pending)
+
+
+def write_summary(path, tasks, results):
+    """Save one column per swept parameter, the seed, and one column per metric to ``path`` (.npz)."""
+    columns = {'key': np.array([run_key(task) for task in tasks]),
+               'seed': np.array([task['seed'] for task in tasks])}
+    for name in tasks[0]['params']:
+        columns[name] = np.array([task['params'][name] for task in tasks])
+    for name in results[0]:
+        columns[name] = np.array([metrics[name] for metrics in results])
+    np.savez_compressed(path, **columns)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--ruleset', choices=ruleset_names(), default='city4')
+    parser.add_argument('--param', type=parse_param, action='append', default=[], metavar='NAME=V1,V2,...',
+                        help='values of one parameter; may be repeated, every combination is run')
+    parser.add_argument('--steps', type=int, default=100, help='generations per run')
+    parser.add_argument('--size', type=parse_size, default=(56, 80), help='ROWSxCOLS of the random grids')
+    parser.add_argument('--density', type=float, default=0.3, help='fraction of occupied cells')
+    parser.add_argument('--seed', type=int, default=0, help='first seed')
+    parser.add_argument('--seeds', type=int, default=1, help='runs per combination, with consecutive seeds')
+    parser.add_argument('--workers', type=int, help='processes to run on (default: one per CPU)')
+    parser.add_argument('--cache', help='directory of finished runs, reused by later sweeps')
+    parser.add_argument('--output', default='sweep.npz', help='columnar summary file (.npz)')
+    args = parser.parse_args(argv)
+
+    if args.seeds < 1:
+        parser.error('--seeds must be at least 1')
+    ruleset = get_ruleset(args.ruleset)
+    names = [name for name, _ in args.param]
+    if len(set(names)) != len(names):
+        parser.error('each --param may be given once')
+    tasks = []
+    for values in itertools.product(*(values for _, values in args.param)):
+        point = dict(zip(names, values))
+        try:
+            apply_overrides(ruleset.defaults, point)
+        except ValueError as error:
+            parser.error(str(error))
+        for seed in range(args.seed, args.seed + args.seeds):
+            tasks.append({'ruleset': args.ruleset, 'params': point, 'seed': seed, 'steps': args.steps,
+                          'size': list(args.size), 'density': args.density})
+
+    start = time.perf_counter()
+    results, cached = sweep(tasks, args.cache, args.workers)
+    write_summary(args.output, tasks, results)
+    print(f'{args.ruleset}: {len(tasks)} runs ({cached} cached) in {time.perf_counter() - start:.3f}s; '
+          f'summary in {args.output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+"""Steady-state stepping of the buffered rulesets allocates nothing that grows with the grid."""
+import tracemalloc
+
+import numpy as np
+import pytest
+
+from simulation import get_ruleset
+from simulation.buffered import BufferedStepper
+
+BUFFERED_RULESETS = ['life', 'city', 'city2', 'city2-green', 'city3', 'city4',
+                     'life-lut', 'city-lut', 'city2-lut', 'city3-lut']
+# Small fixed allocations per step (NumPy's ufunc buffers, parameter dicts, city4's per-step generator)
+PEAK_BOUND = 256 * 1024
+STEPS = 5
+
+
+def traced_peak(name, size):
+    ruleset = get_ruleset(name)
+    rng = np.random.default_rng(0)
+    grid = rng.integers(0, ruleset.n_states, size=(size, size), dtype=np.uint8)
+    state = (grid, rng.random((size, size), dtype=np.float32)) if len(ruleset.planes) > 1 else grid
+    stepper = BufferedStepper(name, state, seed=0)
+    stepper.step(2)  # Warm the workspace
+    tracemalloc.start()
+    try:
+        stepper.step(STEPS)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+@pytest.mark.parametrize('name', BUFFERED_RULESETS)
+def test_ruleset_is_registered_as_buffered(name):
+    assert get_ruleset(name).buffered
+
+
+@pytest.mark.parametrize('name', BUFFERED_RULESETS)
+def test_steady_state_peak_is_bounded(name):
+    small, large = traced_peak(name, 128), traced_peak(name, 512)
+    assert small < PEAK_BOUND
+    assert large < PEAK_BOUND
+    # 16x the cells must not mean more memory: nothing grid-sized is allocated
+    assert large <= small + 4096